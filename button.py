@@ -21,10 +21,9 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up button platform."""
-    if entry.entry_id not in hass.data[DOMAIN]:
+    controller = hass.data[DOMAIN].get(entry.entry_id)
+    if controller is None:
         return
-
-    controller = hass.data[DOMAIN][entry.entry_id]
     
     buttons = [
         # SmartOffsetBoostButton(hass, entry, controller),
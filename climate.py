@@ -53,10 +53,10 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up climate platform."""
-    if entry.entry_id not in hass.data[DOMAIN]:
+    controller = hass.data[DOMAIN].get(entry.entry_id)
+    if controller is None:
         return
-    
-    controller = hass.data[DOMAIN][entry.entry_id]
+
     async_add_entities([SmartOffsetVirtualThermostat(hass, entry, controller)])
 
 
@@ -195,7 +195,7 @@ class SmartOffsetVirtualThermostat(ClimateEntity):
         if current_temp is None or target_temp is None:
             return HVACAction.IDLE
         
-        deadband = float(self.controller.opt("deadband") or DEFAULTS.get("deadband", 0.2))
+        deadband = self.controller.deadband
         error = target_temp - current_temp
         
         if error > deadband:
@@ -204,7 +204,7 @@ class SmartOffsetVirtualThermostat(ClimateEntity):
             return HVACAction.IDLE
         else:
             # В deadband — используем последнее действие контроллера
-            last_action = getattr(self.controller, "last_action", "")
+            last_action = self.controller.last_action
             if "heating" in last_action or "set_temperature" in last_action:
                 return HVACAction.HEATING
             return HVACAction.IDLE
@@ -216,11 +216,11 @@ class SmartOffsetVirtualThermostat(ClimateEntity):
         return {
             "thermostat": self.entry.data.get(CONF_CLIMATE),
             "room_sensors": room_entities,
-            "offset": self.controller.storage.get_offset(self.entry.entry_id),
-            "last_action": getattr(self.controller, "last_action", ""),
-            "last_error": getattr(self.controller, "last_error", None),
-            "window_open": getattr(self.controller, "window_is_open", False),
-            "boost_active": getattr(self.controller, "boost_active", False),
+            "offset": self.controller.offset,
+            "last_action": self.controller.last_action,
+            "last_error": self.controller.last_error,
+            "window_open": self.controller.window_is_open,
+            "boost_active": self.controller.boost_active,
         }
 
     async def async_set_temperature(self, **kwargs: Any) -> None:
@@ -5,6 +5,12 @@ PLATFORMS = ["sensor", "button", "climate", "switch"]
 
 # Сигналы
 SIGNAL_UPDATE = "smart_thermostat_update"
+# Группы сенсоров: f"{SIGNAL_UPDATE}_{entry_id}_{group}" шлётся, только если группа изменилась
+UPDATE_GROUP_TEMPS = "temps"
+UPDATE_GROUP_ACTION = "action"
+UPDATE_GROUP_STATE = "state"
+UPDATE_GROUP_HISTORY = "history"
+UPDATE_GROUPS = (UPDATE_GROUP_TEMPS, UPDATE_GROUP_ACTION, UPDATE_GROUP_STATE, UPDATE_GROUP_HISTORY)
 
 # Жёсткие пределы для offset (не конфигурируются)
 MIN_OFFSET = -10.0
@@ -1,18 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import time
+from collections import deque
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Any, Optional, Dict, Tuple, List
+from datetime import timedelta
+from typing import Any, Callable, Optional, Dict, Tuple, List, NamedTuple
 
-from homeassistant.const import ATTR_TEMPERATURE
+from homeassistant.const import ATTR_TEMPERATURE, STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import callback
 from homeassistant.helpers.event import (
     async_track_time_interval,
     async_call_later,
     async_track_state_change_event,
+    async_track_time_change,
 )
 from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.util import dt as dt_util
 from homeassistant.components.climate.const import HVACMode
 
 from .const import *
@@ -21,6 +27,22 @@ LOGGER = logging.getLogger(__name__)
 
 CONF_HVAC_MODE = "hvac_mode"  # локально, чтобы не падать если в const.py ещё не добавили
 
+# строковые значения режимов один раз: в тике без обращения к Enum.value
+_MODE_HEAT: str = HVACMode.HEAT.value
+_MODE_OFF: str = HVACMode.OFF.value
+_MODES = frozenset({_MODE_HEAT, _MODE_OFF})
+
+_INF = float("inf")
+
+_DISPATCH_MIN_INTERVAL_SEC = 1.0  # троттлинг обновлений сущностей
+
+_TICK_DEBOUNCE_SEC = 0.25  # внеплановые тики от событий склеиваются в этом окне
+_CATCHUP_MIN_SEC = 15.0  # нижняя граница доп. тика при большой ошибке
+
+_HISTORY_POINTS = 576  # точек history_graph в памяти
+_HISTORY_WINDOW_SEC = 48 * 3600  # и не старше 48 ч (точки упорядочены по времени)
+_HISTORY_SAVE_DELAY_SEC = 30.0  # серия _notify -> одна запись истории в storage
+
 
 def _clamp(v: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, v))
@@ -32,7 +54,19 @@ def _round_step(v: float, step: float) -> float:
     return round(v / step) * step
 
 
+def _ewma(prev: float, sample: float, alpha: float) -> float:
+    return alpha * sample + (1.0 - alpha) * prev
+
+
+# частые нечисловые состояния HA: отсекаем до float(), без выброса ValueError
+_NON_NUMERIC_STATES = frozenset({STATE_UNAVAILABLE, STATE_UNKNOWN, "", "none", "None"})
+
+
 def _to_float(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if value is None or (isinstance(value, str) and value in _NON_NUMERIC_STATES):
+        return None
     try:
         return float(value)
     except (ValueError, TypeError):
@@ -57,16 +91,18 @@ def _normalize_entity_list(value: Any) -> list[str]:
     return []
 
 
-def _is_truthy_state(state: Any) -> bool:
-    if state is None:
-        return False
-    return str(state).lower() in ("on", "open", "true", "1")
+# HA хранит state строкой; варианты регистра перечислены явно, чтобы не делать .lower()
+_OPEN_STATES = frozenset(
+    {"on", "On", "ON", "open", "Open", "OPEN", "true", "True", "TRUE", "1"}
+)
+
+# режимы TRV, которые синхронизируют теневую копию last_hvac_mode
+_SYNCED_HVAC_MODES = frozenset({HVACMode.HEAT.value, HVACMode.OFF.value})
 
 
-@dataclass
+@dataclass(slots=True)
 class Inputs:
     climate_entity: str
-    climate_state: Any
     t_room: float
     t_target: float
     hvac_mode: str
@@ -74,10 +110,136 @@ class Inputs:
     now_mono: float
 
 
+@dataclass(slots=True, frozen=True)
+class OptsCache:
+    """Опции и сущности, приведённые к типам один раз (entry перезагружается при смене опций)."""
+
+    room_target: float  # только для отображения; тик читает цель из опций напрямую
+    deadband: float
+    step_min: float
+    step_max: float
+    trv_min: float
+    trv_max: float
+    trv_floor: float  # trv_min/trv_max, округлённые к step_min (window / boost)
+    trv_ceiling: float
+    learn_rate_fast: float
+    learn_rate_slow: float
+    cooldown: float
+    overshoot_threshold: float
+    predict_minutes: int
+    heating_alpha: float
+    heating_keep: float  # 1 - heating_alpha, для EWMA скорости нагрева
+    stuck_enable: bool
+    stuck_seconds: int
+    stuck_min_drop: float
+    stuck_step: float
+    min_offset_change: float
+    enable_learning: bool
+    no_learn_summer: bool
+    window_no_learn_seconds: int
+    interval_sec: int
+    boost_duration_sec: int
+    outdoor_sensor: Optional[str]
+    weather_entity: Optional[str]
+    ttt_alpha: float
+    stable_learn_seconds: int
+    stable_learn_alpha: float
+    offset_decay_rate: float
+    offset_decay_threshold: float
+    offset_learn_threshold: float
+    max_stuck_bias: float
+    ttt_soft_min: float
+    climate_entity: str
+    room_entities: Tuple[str, ...]
+    window_entities: Tuple[str, ...]
+
+
+class HistRec(NamedTuple):
+    """Точка истории для history_graph (в storage хранится как dict)."""
+
+    time: float
+    error: Optional[float]
+    offset: float
+    trv_set: Optional[float]
+    action: str
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "HistRec":
+        return cls(
+            d.get("time", 0.0),
+            d.get("error"),
+            d.get("offset", 0.0),
+            d.get("trv_set"),
+            d.get("action", ""),
+        )
+
+
+class _TickGroup:
+    """Один таймер HA на все контроллеры с одинаковым interval_sec."""
+
+    __slots__ = ("unsub", "controllers")
+
+    def __init__(self):
+        self.unsub: Optional[Callable[[], None]] = None
+        self.controllers: List["SmartOffsetController"] = []
+
+
+_TICK_GROUPS_KEY = "tick_groups"  # hass.data[DOMAIN][...]: interval -> _TickGroup
+
+
+def _register_tick(hass, interval: int, controller: "SmartOffsetController") -> Callable[[], None]:
+    # группы живут в hass.data, как и storage: у каждого экземпляра hass свои таймеры
+    groups: Dict[int, _TickGroup] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        _TICK_GROUPS_KEY, {}
+    )
+    group = groups.get(interval)
+    if group is None:
+        group = groups[interval] = _TickGroup()
+
+        @callback
+        def _fire(now):
+            # у каждого контроллера свой task: ошибка одного не мешает остальным
+            for ctrl in tuple(group.controllers):
+                hass.async_create_task(ctrl._tick(now))
+
+        group.unsub = async_track_time_interval(hass, _fire, timedelta(seconds=interval))
+
+    group.controllers.append(controller)
+
+    def _unregister():
+        if controller in group.controllers:
+            group.controllers.remove(controller)
+        if not group.controllers and groups.get(interval) is group:
+            del groups[interval]
+            group.unsub()
+
+    return _unregister
+
+
 class SmartOffsetController:
+    # фиксированный набор полей: без __dict__ на экземпляр, доступ к self.* через слоты
+    __slots__ = (
+        "hass", "entry", "storage", "unsub", "_o", "_offset", "last_set", "last_change",
+        "last_action", "last_error", "_last_error_milli", "last_target_trv", "change_count",
+        "last_hvac_mode", "_unsub_trv", "_trv_state", "_boost_unsub", "boost_active", "boost_until",
+        "window_is_open", "_window_open_since", "_unsub_window", "_window_entities", "_window_bits", "_window_open_mask",
+        "_last_room_target", "_stable_expiry", "_stable_target",
+        "_is_summer_cached", "_unsub_season", "_history_data", "_history_json", "_history_save_unsub", "_force_next_control",
+        "_pending_tick", "_catchup_unsub", "_notify_scheduled", "_last_dispatch", "loop_now", "_dispatch_pending", "_stopped",
+        "_stuck_active", "_stuck_ref_temp", "_stuck_ref_time", "_stuck_bias", "_heat_episode",
+        "_minutes_per_degree", "_heating_rate", "_overshoot_count",
+        "_learn_rate_slow", "_last_heating_rate_save", "_last_offset_update",
+        "_prev_room_temp", "_prev_time", "_monotonic", "_entry_id", "_signal", "_group_signals", "_group_prints",
+    )
+
     def __init__(self, hass, entry, storage):
         self.hass = hass
+        self._monotonic = hass.loop.time  # связанный метод: без двух getattr на каждый вызов
         self.entry = entry
+        self._entry_id: str = entry.entry_id
+        self._signal: str = f"{SIGNAL_UPDATE}_{entry.entry_id}"
+        self._group_signals: Tuple[str, ...] = tuple(f"{self._signal}_{g}" for g in UPDATE_GROUPS)
+        self._group_prints: Tuple[Any, ...] = (None,) * len(UPDATE_GROUPS)
         self.storage = storage
 
         self.unsub = None
@@ -87,11 +249,14 @@ class SmartOffsetController:
         self.last_change = 0.0
         self.last_action = "init"
         self.last_error: Optional[float] = None
+        self._last_error_milli: Optional[int] = None  # last_error в тысячных °C
         self.last_target_trv: Optional[float] = None
         self.change_count = 0
 
-        # hvac mode anti-spam
+        # hvac mode anti-spam (синхронизируется подпиской на состояние TRV)
         self.last_hvac_mode: Optional[str] = None
+        self._unsub_trv = None
+        self._trv_state = None  # последнее состояние TRV из подписки (None — сущности нет)
 
         # boost
         self._boost_unsub = None
@@ -103,20 +268,33 @@ class SmartOffsetController:
         self._window_open_since: Optional[float] = None
         self._unsub_window = None
         self._window_entities: Tuple[str, ...] = tuple()
+        # бит на датчик: событие меняет только свой бит, открыто == mask != 0
+        self._window_bits: Dict[str, int] = {}
+        self._window_open_mask = 0
 
         # stability tracking
         self._last_room_target: Optional[float] = None
-        self._stable_since: Optional[float] = None
+        self._stable_expiry = _INF  # момент, после которого стабильный hold можно учить
         self._stable_target: Optional[float] = None
-        self._stable_last_set: Optional[float] = None
+
+        # summer no-learn: флаг обновляется раз в сутки (полночь), не в тике
+        self._is_summer_cached = False
+        self._unsub_season = None
 
         # history
-        self._history_data: list[Dict[str, Any]] = []
+        self._history_data: deque[HistRec] = deque(maxlen=_HISTORY_POINTS)
+        # JSON для сенсора history_graph; сбрасывается при новой точке
+        self._history_json: Optional[str] = None
+        self._history_save_unsub: Optional[Callable[[], None]] = None
+
+        # offset: горячая копия, storage — только персистентность
+        self._offset: float = self.storage.get_offset(self._entry_id)
 
         # ttt / dynamics
         self._heating_rate = 0.1
-        self._prev_room_temp: Optional[float] = None
-        self._prev_time: Optional[float] = None
+        # -inf вместо None: dt = inf не проходит окно 15 с .. 30 мин
+        self._prev_room_temp = 0.0
+        self._prev_time = -_INF
         self._last_heating_rate_save: float = 0.0
 
         self._overshoot_count = 0
@@ -125,6 +303,15 @@ class SmartOffsetController:
 
         # stuck logic (bias to force down)
         self._force_next_control = False
+        self._pending_tick: Optional[asyncio.TimerHandle] = None
+        self._catchup_unsub: Optional[Callable[[], None]] = None
+        self._notify_scheduled = False
+        self._last_dispatch = -_INF
+        # loop.time() последней рассылки: сенсоры одного обновления читают одно «сейчас»
+        self.loop_now: float = self._monotonic()
+        self._dispatch_pending: Optional[asyncio.TimerHandle] = None
+        # async_stop начат: уже поставленные call_soon/тики ничего не перевзводят
+        self._stopped = False
         self._stuck_active = False
         self._stuck_ref_temp: Optional[float] = None
         self._stuck_ref_time: Optional[float] = None
@@ -132,21 +319,29 @@ class SmartOffsetController:
 
         self._heat_episode: Optional[Dict[str, float]] = None
         self._minutes_per_degree = (
-            self.storage.get_minutes_per_degree(self.entry.entry_id)
+            self.storage.get_minutes_per_degree(self._entry_id)
             if hasattr(self.storage, "get_minutes_per_degree")
             else 15.0
         )
 
-        # options snapshot (read on init; still use opt() for runtime reads)
-        self._ttt_alpha = float(self.opt(CONF_TTT_ALPHA))
+        # options snapshot: entry перезагружается при смене опций, поэтому кэш
+        # строится один раз; в тике opt() не вызываем
+        self._o = self._build_opts_cache()
+
+    @property
+    def offset(self) -> float:
+        """Текущий offset (горячая копия; storage только для персистентности)."""
+        return self._offset
+
+    @property
+    def deadband(self) -> float:
+        """Зона нечувствительности из снимка опций."""
+        return self._o.deadband
 
-        self.stable_learn_seconds = int(self.opt(CONF_STABLE_LEARN_SECONDS))
-        self.stable_learn_alpha = float(self.opt(CONF_STABLE_LEARN_ALPHA))
-        self.offset_decay_rate = float(self.opt(CONF_OFFSET_DECAY_RATE))
-        self.offset_decay_threshold = float(self.opt(CONF_OFFSET_DECAY_THRESHOLD))
-        self.offset_learn_threshold = float(self.opt(CONF_OFFSET_LEARN_THRESHOLD))
-        self.max_stuck_bias = float(self.opt(CONF_MAX_STUCK_BIAS))
-        self.ttt_soft_min = float(self.opt(CONF_TTT_SOFT_MIN))
+    @property
+    def room_target(self) -> float:
+        """room_target из опций (только для отображения)."""
+        return self._o.room_target
 
     def opt(self, key: str) -> Any:
         if key in self.entry.options:
@@ -155,58 +350,210 @@ class SmartOffsetController:
             return self.entry.data[key]
         return DEFAULTS.get(key)
 
-    def _notify(self):
-        now = time.time()
-        offset = self.storage.get_offset(self.entry.entry_id)
-
-        self._history_data.append(
-            {
-                "time": now,
-                "error": self.last_error,
-                "offset": offset,
-                "trv_set": self.last_set,
-                "action": self.last_action,
-            }
+    def _opt_or(self, key: str, default: Any) -> Any:
+        # явная проверка на None: 0 / 0.0 / False — валидные значения опций
+        v = self.opt(key)
+        return default if v is None else v
+
+    def _build_opts_cache(self) -> OptsCache:
+        step_min = float(self._opt_or(CONF_STEP_MIN, DEFAULT_STEP_MIN))
+        trv_min = float(self._opt_or(CONF_TRV_MIN, DEFAULT_TRV_MIN))
+        trv_max = float(self._opt_or(CONF_TRV_MAX, DEFAULT_TRV_MAX))
+        heating_alpha = float(self._opt_or(CONF_HEATING_ALPHA, DEFAULT_HEATING_ALPHA))
+        return OptsCache(
+            room_target=float(self._opt_or(CONF_ROOM_TARGET, DEFAULTS[CONF_ROOM_TARGET])),
+            deadband=float(self._opt_or(CONF_DEADBAND, DEFAULT_DEADBAND)),
+            step_min=step_min,
+            step_max=float(self._opt_or(CONF_STEP_MAX, DEFAULT_STEP_MAX)),
+            trv_min=trv_min,
+            trv_max=trv_max,
+            trv_floor=_round_step(trv_min, step_min),
+            trv_ceiling=_round_step(trv_max, step_min),
+            learn_rate_fast=float(self._opt_or(CONF_LEARN_RATE_FAST, DEFAULT_LEARN_RATE_FAST)),
+            learn_rate_slow=float(self._opt_or(CONF_LEARN_RATE_SLOW, DEFAULT_LEARN_RATE_SLOW)),
+            cooldown=float(self._opt_or(CONF_COOLDOWN_SEC, DEFAULT_COOLDOWN_SEC)),
+            overshoot_threshold=float(
+                self._opt_or(CONF_OVERSHOOT_THRESHOLD, DEFAULT_OVERSHOOT_THRESHOLD)
+            ),
+            predict_minutes=int(self._opt_or(CONF_PREDICT_MINUTES, DEFAULT_PREDICT_MINUTES)),
+            heating_alpha=heating_alpha,
+            heating_keep=1.0 - heating_alpha,
+            stuck_enable=bool(self.opt(CONF_STUCK_ENABLE)),
+            stuck_seconds=int(self._opt_or(CONF_STUCK_SECONDS, DEFAULT_STUCK_SECONDS)),
+            stuck_min_drop=float(self._opt_or(CONF_STUCK_MIN_DROP, DEFAULT_STUCK_MIN_DROP)),
+            stuck_step=float(self._opt_or(CONF_STUCK_STEP, DEFAULT_STUCK_STEP)),
+            min_offset_change=float(
+                self._opt_or(CONF_MIN_OFFSET_CHANGE, DEFAULT_MIN_OFFSET_CHANGE)
+            ),
+            enable_learning=bool(self.opt(CONF_ENABLE_LEARNING)),
+            no_learn_summer=bool(self._opt_or(CONF_NO_LEARN_SUMMER, DEFAULT_NO_LEARN_SUMMER)),
+            window_no_learn_seconds=self._window_no_learn_seconds(),
+            interval_sec=int(self._opt_or(CONF_INTERVAL_SEC, DEFAULT_INTERVAL_SEC)),
+            boost_duration_sec=int(
+                self._opt_or(CONF_BOOST_DURATION_SEC, DEFAULT_BOOST_DURATION_SEC)
+            ),
+            outdoor_sensor=self.opt(CONF_OUTDOOR_SENSOR),
+            weather_entity=self.opt(CONF_WEATHER_ENTITY),
+            ttt_alpha=float(self.opt(CONF_TTT_ALPHA)),
+            stable_learn_seconds=int(self.opt(CONF_STABLE_LEARN_SECONDS)),
+            stable_learn_alpha=float(self.opt(CONF_STABLE_LEARN_ALPHA)),
+            offset_decay_rate=float(self.opt(CONF_OFFSET_DECAY_RATE)),
+            offset_decay_threshold=float(self.opt(CONF_OFFSET_DECAY_THRESHOLD)),
+            offset_learn_threshold=float(self.opt(CONF_OFFSET_LEARN_THRESHOLD)),
+            max_stuck_bias=float(self.opt(CONF_MAX_STUCK_BIAS)),
+            ttt_soft_min=float(self.opt(CONF_TTT_SOFT_MIN)),
+            climate_entity=self.entry.data[CONF_CLIMATE],
+            room_entities=tuple(_normalize_entity_list(self.entry.data.get(CONF_ROOM_SENSORS, []))),
+            window_entities=tuple(e for e in _normalize_entity_list(self.opt(CONF_WINDOW_SENSORS)) if e),
         )
 
-        if len(self._history_data) > 576:
-            self._history_data = self._history_data[-576:]
+    def _notify(self):
+        # несколько _notify за одну итерацию цикла -> одна точка истории и один dispatch
+        if self._notify_scheduled or self._stopped:
+            return
+        self._notify_scheduled = True
+        self.hass.loop.call_soon(self._flush_notify)
+
+    def history_json(self) -> str:
+        """История для атрибутов: JSON строится один раз на новую точку."""
+        data = self._history_json
+        if data is None:
+            data = self._history_json = json.dumps(
+                [p._asdict() for p in self._history_data], separators=(",", ":")
+            )
+        return data
 
-        if len(self._history_data) % 10 == 0:
-            self.hass.async_create_task(
-                self.storage.set_history(self.entry.entry_id, self._history_data)
+    @callback
+    def _flush_notify(self):
+        self._notify_scheduled = False
+        if self._stopped:
+            return
+        now = time.time()
+        offset = self._offset
+
+        hist = self._history_data
+        hist.append(HistRec(now, self.last_error, offset, self.last_set, self.last_action))
+        # устаревшие точки только в голове очереди: обычно 0 или 1 popleft за вызов
+        cutoff = now - _HISTORY_WINDOW_SEC
+        while hist[0].time < cutoff:
+            hist.popleft()
+        self._history_json = None
+
+        if self._history_save_unsub is None:
+            self._history_save_unsub = async_call_later(
+                self.hass, _HISTORY_SAVE_DELAY_SEC, self._save_history_later
             )
 
-        async_dispatcher_send(self.hass, f"{SIGNAL_UPDATE}_{self.entry.entry_id}")
+        # сущностям хватает не больше одного обновления в секунду
+        if self._dispatch_pending is not None:
+            return
+        wait = self._last_dispatch + _DISPATCH_MIN_INTERVAL_SEC - self._monotonic()
+        if wait <= 0:
+            self._send_update()
+        else:
+            self._dispatch_pending = self.hass.loop.call_later(wait, self._send_update)
+
+    @callback
+    def _send_update(self):
+        self._dispatch_pending = None
+        self.loop_now = self._last_dispatch = self._monotonic()
+        async_dispatcher_send(self.hass, self._signal)
+
+        # сенсоры подписаны на свои группы: будим только те, чьи поля изменились
+        prints = self._group_fingerprints()
+        for signal, fp, old in zip(self._group_signals, prints, self._group_prints):
+            if fp != old:
+                async_dispatcher_send(self.hass, signal)
+        self._group_prints = prints
+
+    def _group_fingerprints(self) -> Tuple[Any, ...]:
+        """Отпечатки полей по группам UPDATE_GROUPS (порядок тот же)."""
+        boosting = self.boost_active
+        hist = self._history_data
+        return (
+            # temps: error / offset / target_trv / last_set / heating_rate / predicted_time
+            (self.last_error, self._offset, self.last_target_trv, self.last_set, self._heating_rate),
+            # action: last_action(_text) / change_count и их атрибуты
+            (
+                self.last_action, self.change_count, self.last_error, self.window_is_open,
+                boosting, self.last_set, self.last_target_trv,
+            ),
+            # state: window / boost; boost_remaining тикает, пока boost активен
+            (self.window_is_open, boosting, self.boost_until, self.loop_now if boosting else 0.0),
+            # history: новая точка
+            (len(hist), hist[-1].time if hist else None),
+        )
+
+    @callback
+    def _save_history_later(self, _now):
+        self._history_save_unsub = None
+        if self._stopped:
+            return
+        self.storage.set_history(self._entry_id, self._history_data)
+
+    def _update_offset(self, offset: float, reason: str = ""):
+        self._offset = float(offset)
+        self.storage.set_offset(self._entry_id, self._offset, reason=reason)
 
     # -------------------------
     # lifecycle
     # -------------------------
     async def async_start(self):
-        self._history_data = self.storage.get_history(self.entry.entry_id) or []
-        self._heating_rate = self.storage.get_heating_rate(self.entry.entry_id)
-        self._overshoot_count = self.storage.get_overshoot_count(self.entry.entry_id)
-        self._learn_rate_slow = float(
-            self.opt(CONF_LEARN_RATE_SLOW) or DEFAULT_LEARN_RATE_SLOW
+        self._history_data = deque(
+            (HistRec.from_dict(p) for p in self.storage.get_history(self._entry_id) or []),
+            maxlen=_HISTORY_POINTS,
+        )
+        self._history_json = None
+        self._heating_rate = self.storage.get_heating_rate(self._entry_id)
+        self._overshoot_count = self.storage.get_overshoot_count(self._entry_id)
+        self._learn_rate_slow = self._o.learn_rate_slow
+
+        self._trv_state = self.hass.states.get(self._o.climate_entity)
+        self._unsub_trv = async_track_state_change_event(
+            self.hass, self._o.climate_entity, self._on_trv_state_change
         )
 
-        interval = int(self.opt(CONF_INTERVAL_SEC) or DEFAULT_INTERVAL_SEC)
-        self.unsub = async_track_time_interval(
-            self.hass, self._tick, timedelta(seconds=interval)
+        self._ensure_window_listener(self._o.window_entities)
+
+        self._refresh_season()
+        self._unsub_season = async_track_time_change(
+            self.hass, self._refresh_season, hour=0, minute=0, second=0
         )
+
+        self.unsub = _register_tick(self.hass, self._o.interval_sec, self)
         await self._tick(None)
 
     async def async_stop(self):
+        self._stopped = True
         self._cancel_boost()
         if self.unsub:
             self.unsub()
             self.unsub = None
-
-        await self.storage.set_heating_rate(
-            self.entry.entry_id, self._heating_rate, reason="shutdown"
-        )
-        await self.storage.set_overshoot_count(self.entry.entry_id, self._overshoot_count)
-        await self.storage.set_history(self.entry.entry_id, self._history_data)
+        if self._history_save_unsub:
+            self._history_save_unsub()
+            self._history_save_unsub = None
+        if self._pending_tick is not None:
+            self._pending_tick.cancel()
+            self._pending_tick = None
+        if self._catchup_unsub is not None:
+            self._catchup_unsub()
+            self._catchup_unsub = None
+        if self._dispatch_pending is not None:
+            self._dispatch_pending.cancel()
+            self._dispatch_pending = None
+        if self._unsub_trv:
+            self._unsub_trv()
+            self._unsub_trv = None
+        if self._unsub_season:
+            self._unsub_season()
+            self._unsub_season = None
+
+        # записи в общее хранилище синхронны, затем одна принудительная запись
+        entry_id = self._entry_id
+        self.storage.set_heating_rate(entry_id, self._heating_rate, reason="shutdown")
+        self.storage.set_overshoot_count(entry_id, self._overshoot_count)
+        self.storage.set_history(entry_id, self._history_data)
+        await self.storage.async_save_force()
 
         if self._unsub_window:
             try:
@@ -220,24 +567,50 @@ class SmartOffsetController:
             self._force_next_control = True
         await self._tick(None)
 
+    def _schedule_tick(self, force: bool = False):
+        if force:
+            self._force_next_control = True
+        if self._pending_tick is not None:
+            return
+        # серия событий (несколько датчиков окна, конец boost) в пределах окна -> один тик
+        self._pending_tick = self.hass.loop.call_later(
+            _TICK_DEBOUNCE_SEC, self._run_pending_tick
+        )
+
+    def _schedule_catchup_tick(self):
+        if self._catchup_unsub is not None:
+            return
+        delay = max(_CATCHUP_MIN_SEC, self._o.interval_sec / 2)
+        self._catchup_unsub = async_call_later(self.hass, delay, self._run_catchup_tick)
+
+    @callback
+    def _run_catchup_tick(self, _now):
+        self._catchup_unsub = None
+        self._schedule_tick()
+
+    @callback
+    def _run_pending_tick(self):
+        self._pending_tick = None
+        self.hass.async_create_task(self._tick(None))
+
     async def reset_offset(self):
-        await self.storage.set_offset(self.entry.entry_id, 0.0, reason="manual_reset")
+        self._update_offset(0.0, reason="manual_reset")
         self.last_action = "reset_offset"
         await self.trigger_once(force=True)
         self._notify()
 
     async def start_boost(self):
-        duration = int(self.opt(CONF_BOOST_DURATION_SEC) or DEFAULT_BOOST_DURATION_SEC)
+        duration = self._o.boost_duration_sec
         duration = max(30, min(duration, 3600))
 
         self._cancel_boost()
         self.boost_active = True
-        self.boost_until = self.hass.loop.time() + float(duration)
+        self.boost_until = self._monotonic() + float(duration)
 
-        async def _end(_):
+        @callback
+        def _end(_):
             self._cancel_boost()
-            await self.trigger_once(force=True)
-            self._notify()
+            self._schedule_tick(force=True)
 
         self._boost_unsub = async_call_later(self.hass, float(duration), _end)
         await self.trigger_once(force=True)
@@ -257,12 +630,10 @@ class SmartOffsetController:
         self.boost_until = 0.0
 
     def _reset_stability_tracking(self):
-        self._stable_since = None
+        self._stable_expiry = _INF
         self._stable_target = None
-        self._stable_last_set = None
 
-    def _ensure_window_listener(self, window_entities: Optional[list[str]]):
-        entities = tuple([e for e in _normalize_entity_list(window_entities) if e])
+    def _ensure_window_listener(self, entities: Tuple[str, ...]):
         if entities == self._window_entities:
             return
 
@@ -274,39 +645,93 @@ class SmartOffsetController:
             self._unsub_window = None
 
         self._window_entities = entities
-        if not entities:
-            return
-
-        def _compute_open() -> bool:
-            for ent in entities:
-                st = self.hass.states.get(ent)
-                if st is None:
-                    continue
-                if _is_truthy_state(st.state):
-                    return True
-            return False
-
-        async def _on_window_change(_event):
-            is_open = _compute_open()
-            now = self.hass.loop.time()
-
-            if is_open != self.window_is_open:
-                self.window_is_open = is_open
-                self._window_open_since = now if is_open else None
-
-            await self.trigger_once(force=True)
-            self._notify()
+        if entities:
+            self._unsub_window = async_track_state_change_event(
+                self.hass, entities, self._on_window_state_change
+            )
 
-        self._unsub_window = async_track_state_change_event(
-            self.hass, list(entities), _on_window_change
+        # начальная синхронизация: дальше маску ведут только события
+        self._window_bits = {ent: 1 << i for i, ent in enumerate(entities)}
+        states_get = self.hass.states.get
+        mask = 0
+        for ent, bit in self._window_bits.items():
+            st = states_get(ent)
+            if st is not None and st.state in _OPEN_STATES:
+                mask |= bit
+        self._window_open_mask = mask
+        is_open = mask != 0
+        if is_open != self.window_is_open:
+            self.window_is_open = is_open
+            self._window_open_since = self._monotonic() if is_open else None
+
+    @callback
+    def _on_window_state_change(self, event):
+        bit = self._window_bits.get(event.data.get("entity_id"))
+        if bit is None:
+            return
+        new_state = event.data.get("new_state")
+        if new_state is not None and new_state.state in _OPEN_STATES:
+            self._window_open_mask |= bit
+        else:
+            self._window_open_mask &= ~bit
+        is_open = self._window_open_mask != 0
+        now = self._monotonic()
+
+        if is_open != self.window_is_open:
+            self.window_is_open = is_open
+            self._window_open_since = now if is_open else None
+
+        # несколько датчиков в одной итерации цикла -> один тик (он же сделает _notify)
+        self._schedule_tick(force=True)
+
+    @callback
+    def _on_trv_state_change(self, event):
+        # состояние climate-сущности == её hvac_mode; внешняя смена heat/off
+        # обновляет теневую копию, и следующий тик вернёт нужный режим.
+        # Прочие состояния (auto, unavailable, ...) копию не трогают: TRV, который
+        # сам показывает auto после heat, иначе получал бы set_hvac_mode каждый тик
+        new_state = event.data.get("new_state")
+        self._trv_state = new_state
+        if new_state is None:
+            return
+        mode = new_state.state
+        if mode in _SYNCED_HVAC_MODES:
+            self.last_hvac_mode = mode
+
+    def _set_trv_temperature(self, entity_id: str, temp: float, now: float) -> bool:
+        # сравнение с last_set делают вызывающие (порог step_min >= 0.05, см. config_flow)
+
+        # TRV уже стоит на нужной уставке (например, после рестарта) — не будим радио
+        trv_state = self._trv_state
+        if trv_state is not None:
+            current = _to_float(trv_state.attributes.get(ATTR_TEMPERATURE))
+            if current is not None and abs(temp - current) < 0.01:
+                self.last_set = temp
+                # форс исполнен: TRV уже на цели, иначе он висел бы до следующей отправки
+                self._force_next_control = False
+                return False
+
+        prev_set = self.last_set
+        prev_change = self.last_change
+        self.last_set = temp
+        self.last_change = now
+        self.change_count += 1
+        self._force_next_control = False
+        # фоновая задача: HA не ждёт её при старте/остановке, тик не держит
+        self.hass.async_create_background_task(
+            self._async_send_trv_temperature(entity_id, temp, prev_set, now, prev_change),
+            f"smart_thermostat_set_temperature_{entity_id}",
         )
+        return True
 
-    async def _set_trv_temperature(self, entity_id: str, temp: float) -> bool:
-        now = self.hass.loop.time()
-
-        if self.last_set is not None and abs(temp - self.last_set) < 0.01:
-            return False
-
+    async def _async_send_trv_temperature(
+        self,
+        entity_id: str,
+        temp: float,
+        prev_set: Optional[float],
+        now: float,
+        prev_change: float,
+    ):
         try:
             await self.hass.services.async_call(
                 "climate",
@@ -314,93 +739,98 @@ class SmartOffsetController:
                 {"entity_id": entity_id, ATTR_TEMPERATURE: temp},
                 blocking=False,
             )
-            self.last_set = temp
-            self.last_change = now
-            self.change_count += 1
-            self._force_next_control = False
-            return True
         except Exception as e:
             LOGGER.error("Ошибка установки температуры на %s: %s", entity_id, e)
             self.last_action = "set_failed"
-            return False
-
-    async def _set_trv_hvac_mode(self, entity_id: str, mode: HVACMode | str) -> bool:
+            # неудачная отправка — не изменение: не считаем её и не запускаем cooldown
+            if self.last_set == temp:
+                self.last_set = prev_set
+            if self.last_change == now:
+                self.last_change = prev_change
+            self.change_count -= 1
+
+    def _set_trv_hvac_mode(self, entity_id: str, mode: HVACMode | str) -> bool:
         mode_val = mode.value if isinstance(mode, HVACMode) else str(mode)
 
         if self.last_hvac_mode == mode_val:
             return False
 
+        # как и для температуры: теневая копия сразу, вызов сервиса — фоном;
+        # задачи создаются по порядку, set_hvac_mode уйдёт раньше set_temperature
+        prev_mode = self.last_hvac_mode
+        self.last_hvac_mode = mode_val
+        self.hass.async_create_background_task(
+            self._async_send_trv_hvac_mode(entity_id, mode_val, prev_mode),
+            f"smart_thermostat_set_hvac_mode_{entity_id}",
+        )
+        return True
+
+    async def _async_send_trv_hvac_mode(
+        self, entity_id: str, mode_val: str, prev_mode: Optional[str]
+    ):
         try:
             await self.hass.services.async_call(
                 "climate",
                 "set_hvac_mode",
                 {"entity_id": entity_id, "hvac_mode": mode_val},
-                blocking=True,
+                blocking=False,
             )
-            self.last_hvac_mode = mode_val
-            return True
         except Exception as e:
             LOGGER.error("Ошибка установки hvac_mode=%s на %s: %s", mode_val, entity_id, e)
             self.last_action = "set_hvac_mode_failed"
-            return False
+            if self.last_hvac_mode == mode_val:
+                self.last_hvac_mode = prev_mode
 
     # -------------------------
     # inputs / mode selection
     # -------------------------
-    async def _read_inputs(self, now_mono: float) -> Optional[Inputs]:
-        climate_entity = self.entry.data[CONF_CLIMATE]
+    def _read_inputs(self, now_mono: float) -> Optional[Inputs]:
+        climate_entity = self._o.climate_entity
 
-        room_entities = _normalize_entity_list(self.entry.data.get(CONF_ROOM_SENSORS, []))
+        room_entities = self._o.room_entities
         if not room_entities:
             self.last_action = "skipped_no_room_sensors"
             return None
 
-        temps: list[float] = []
+        # среднее за один проход, без промежуточного списка
+        total = 0.0
+        n = 0
+        states_get = self.hass.states.get
         for entity in room_entities:
-            st = self.hass.states.get(entity)
-            if st is None:
+            st = states_get(entity)
+            if st is None or st.state in _NON_NUMERIC_STATES:
                 continue
-            t = _to_float(st.state)
-            if t is not None:
-                temps.append(t)
+            try:
+                total += float(st.state)
+            except (ValueError, TypeError):
+                continue
+            n += 1
 
-        if not temps:
+        if not n:
             self.last_action = "skipped_no_valid_room_temp"
             return None
 
-        t_room = sum(temps) / len(temps)
+        t_room = total / n
 
-        climate_state = self.hass.states.get(climate_entity)
-        if climate_state is None:
+        if self._trv_state is None:
             self.last_action = "skipped_unavailable_climate"
             return None
 
         t_target = float(self.opt(CONF_ROOM_TARGET))
 
         # hvac_mode from options (virtual)
-        mode_raw = self.entry.options.get(CONF_HVAC_MODE, HVACMode.HEAT.value)
-        hvac_mode = mode_raw.value if isinstance(mode_raw, HVACMode) else str(mode_raw).lower()
-
-        # window state
-        window_entities = _normalize_entity_list(self.opt(CONF_WINDOW_SENSORS))
-        self._ensure_window_listener(window_entities)
-
-        window_open = False
-        for ent in window_entities:
-            st = self.hass.states.get(ent)
-            if st is None:
-                continue
-            if _is_truthy_state(st.state):
-                window_open = True
-                break
+        mode_raw = self.entry.options.get(CONF_HVAC_MODE, _MODE_HEAT)
+        if type(mode_raw) is str and mode_raw in _MODES:
+            hvac_mode = mode_raw  # обычный случай: уже строка в нижнем регистре, без .lower()
+        else:
+            hvac_mode = mode_raw.value if isinstance(mode_raw, HVACMode) else str(mode_raw).lower()
 
-        if window_open != self.window_is_open:
-            self.window_is_open = window_open
-            self._window_open_since = now_mono if window_open else None
+        # window state: список датчиков меняется только через options (reload),
+        # состояние поддерживает подписка _on_window_state_change
+        window_open = self.window_is_open
 
         return Inputs(
             climate_entity=climate_entity,
-            climate_state=climate_state,
             t_room=t_room,
             t_target=t_target,
             hvac_mode=hvac_mode,
@@ -411,45 +841,34 @@ class SmartOffsetController:
     # -------------------------
     # ttt learning (heat episodes)
     # -------------------------
-    def _maybe_start_heat_episode(self, now_mono: float, t_room: float, t_target: float, deadband: float):
-        e = t_target - t_room
-        if e <= deadband:
+    def _step_heat_episode(self, now_mono: float, t_room: float, t_target: float, deadband: float):
+        ep = self._heat_episode
+        if ep is None:
+            e = t_target - t_room
+            if e > deadband and not self.window_is_open and not self.boost_active:
+                self._heat_episode = {
+                    "t0": now_mono,
+                    "room0": t_room,
+                    "target0": t_target,
+                    "e0": e,
+                    "max_room": t_room,
+                }
             return
-        if self.window_is_open or self.boost_active:
-            return
-        if self._heat_episode is not None:
-            return
-        self._heat_episode = {
-            "t0": now_mono,
-            "room0": t_room,
-            "target0": t_target,
-            "e0": e,
-            "max_room": t_room,
-        }
-
-    def _update_heat_episode(self, t_room: float):
-        if self._heat_episode is None:
-            return
-        self._heat_episode["max_room"] = max(self._heat_episode["max_room"], t_room)
 
-    async def _maybe_finish_heat_episode(self, now_mono: float, t_room: float, t_target: float, deadband: float):
-        if self._heat_episode is None:
-            return
+        if t_room > ep["max_room"]:
+            ep["max_room"] = t_room
         if t_room + deadband < t_target:
             return
 
-        t0 = self._heat_episode["t0"]
-        e0 = max(0.1, self._heat_episode["e0"])
-        minutes = (now_mono - t0) / 60.0
+        e0 = max(0.1, ep["e0"])
+        minutes = (now_mono - ep["t0"]) / 60.0
         mpd = _clamp(minutes / e0, 2.0, 120.0)
 
-        self._minutes_per_degree = (
-            self._ttt_alpha * mpd + (1.0 - self._ttt_alpha) * self._minutes_per_degree
-        )
+        self._minutes_per_degree = _ewma(self._minutes_per_degree, mpd, self._o.ttt_alpha)
 
         if hasattr(self.storage, "set_minutes_per_degree"):
-            await self.storage.set_minutes_per_degree(
-                self.entry.entry_id, self._minutes_per_degree
+            self.storage.set_minutes_per_degree(
+                self._entry_id, self._minutes_per_degree
             )
 
         LOGGER.info(
@@ -471,74 +890,77 @@ class SmartOffsetController:
         - if user config looks like "minutes" (small number), treat as minutes
         - if looks like "seconds" (large number), treat as seconds
         """
-        v = int(self.opt(CONF_WINDOW_OPEN_NO_LEARN_MIN) or DEFAULT_WINDOW_OPEN_NO_LEARN_SEC)
+        v = int(self._opt_or(CONF_WINDOW_OPEN_NO_LEARN_MIN, DEFAULT_WINDOW_OPEN_NO_LEARN_SEC))
         if v <= 180:  # <= 3 hours => assume minutes (intended)
             return v * 60
         return v  # assume seconds (legacy configs like 600)
 
-    async def _handle_stable_learning(self, inp: Inputs, deadband: float):
-        enable_learning = bool(self.opt(CONF_ENABLE_LEARNING))
-        no_learn_summer = bool(self.opt(CONF_NO_LEARN_SUMMER) or DEFAULT_NO_LEARN_SUMMER)
+    @callback
+    def _refresh_season(self, _now=None):
+        self._is_summer_cached = 6 <= dt_util.now().month <= 8
 
-        now_dt = datetime.now()
-        is_summer = no_learn_summer and 6 <= now_dt.month <= 8
+    def _handle_stable_learning(self, inp: Inputs, deadband: float):
+        o = self._o
+        if not o.enable_learning or self.last_set is None:
+            return
+
+        if o.no_learn_summer and self._is_summer_cached:
+            return
 
         long_window_open = (
             self.window_is_open
             and self._window_open_since is not None
-            and (inp.now_mono - self._window_open_since >= self._window_no_learn_seconds())
+            and (inp.now_mono - self._window_open_since >= o.window_no_learn_seconds)
         )
-
-        if not enable_learning or is_summer or long_window_open or self.last_set is None:
+        if long_window_open:
             return
 
-        if self._stable_since is None or self._stable_target != inp.t_target:
-            self._stable_since = inp.now_mono
+        if self._stable_target != inp.t_target:
+            self._stable_expiry = inp.now_mono + self._o.stable_learn_seconds
             self._stable_target = inp.t_target
-            self._stable_last_set = self.last_set
             return
 
-        if inp.now_mono - self._stable_since < self.stable_learn_seconds:
+        if inp.now_mono < self._stable_expiry:
             return
 
         implied_offset = _clamp(self.last_set - inp.t_room, MIN_OFFSET, MAX_OFFSET)
-        current_offset = self.storage.get_offset(self.entry.entry_id)
-        min_offset_change = float(self.opt(CONF_MIN_OFFSET_CHANGE) or DEFAULT_MIN_OFFSET_CHANGE)
+        current_offset = self._offset
+        min_offset_change = self._o.min_offset_change
 
-        if abs(implied_offset - current_offset) <= self.offset_learn_threshold:
+        if abs(implied_offset - current_offset) <= self._o.offset_learn_threshold:
             self._stuck_bias = 0.0
             self._reset_stability_tracking()
             return
 
-        new_offset = current_offset + self.stable_learn_alpha * (implied_offset - current_offset)
+        new_offset = current_offset + self._o.stable_learn_alpha * (implied_offset - current_offset)
         if abs(new_offset - current_offset) >= min_offset_change:
-            await self.storage.set_offset(self.entry.entry_id, new_offset, reason="stable_learn")
+            self._update_offset(new_offset, reason="stable_learn")
             self.last_action = "stable_learn"
             self._last_offset_update = inp.now_mono
 
         self._stuck_bias = 0.0
         self._reset_stability_tracking()
 
-    async def _handle_offset_decay(self, now_mono: float, enable_learning: bool):
-        if not enable_learning or self._last_offset_update <= 0:
+    def _handle_offset_decay(self, now_mono: float):
+        if self._last_offset_update <= 0:
             return
 
         days_since_update = (now_mono - self._last_offset_update) / (24 * 3600)
         if days_since_update <= 1:
             return
 
-        current_offset = self.storage.get_offset(self.entry.entry_id)
-        min_offset_change = float(self.opt(CONF_MIN_OFFSET_CHANGE) or DEFAULT_MIN_OFFSET_CHANGE)
+        current_offset = self._offset
+        min_offset_change = self._o.min_offset_change
 
-        if abs(current_offset) <= self.offset_decay_threshold:
+        if abs(current_offset) <= self._o.offset_decay_threshold:
             return
 
-        decay = self.offset_decay_rate * days_since_update
+        decay = self._o.offset_decay_rate * days_since_update
         mult = max(0.0, 1.0 - decay)
         new_offset = current_offset * mult
 
         if abs(new_offset - current_offset) >= min_offset_change:
-            await self.storage.set_offset(self.entry.entry_id, new_offset, reason="offset_decay")
+            self._update_offset(new_offset, reason="offset_decay")
             self._last_offset_update = now_mono
             LOGGER.info(
                 "Offset decay: days=%.1f decay=%.3f offset=%.2f -> %.2f",
@@ -548,28 +970,25 @@ class SmartOffsetController:
                 new_offset,
             )
 
-    async def _update_heating_rate(self, t_room: float, now_mono: float, heating_alpha: float):
-        if self._prev_room_temp is None or self._prev_time is None:
-            return
-
-        dt_min = (now_mono - self._prev_time) / 60.0
-        if dt_min <= 0 or dt_min < 0.25 or dt_min > 30.0:
+    def _update_heating_rate(self, t_room: float, now_mono: float):
+        # окно 15 с .. 30 мин проверяем в секундах, в минуты переводим только для rate
+        dt = now_mono - self._prev_time
+        if dt < 15.0 or dt > 1800.0:
             return
 
         dT = t_room - self._prev_room_temp
         if dT <= 0:
             return
 
-        current_rate = dT / dt_min
-        self._heating_rate = heating_alpha * current_rate + (1.0 - heating_alpha) * self._heating_rate
+        o = self._o
+        rate = o.heating_alpha * (dT * 60.0 / dt) + o.heating_keep * self._heating_rate
+        self._heating_rate = rate
 
         if (now_mono - self._last_heating_rate_save) >= 300:
             self._last_heating_rate_save = now_mono
-            await self.storage.set_heating_rate(
-                self.entry.entry_id, self._heating_rate, reason="auto_update"
-            )
+            self.storage.set_heating_rate(self._entry_id, rate, reason="auto_update")
 
-    async def _handle_stuck_detection(
+    def _handle_stuck_detection(
         self,
         t_room: float,
         e: float,
@@ -594,7 +1013,7 @@ class SmartOffsetController:
             if self._stuck_ref_time and (now_mono - self._stuck_ref_time >= stuck_seconds):
                 ref_temp = self._stuck_ref_temp if self._stuck_ref_temp is not None else t_room
                 if t_room >= (ref_temp - stuck_min_drop):
-                    self._stuck_bias = min(self._stuck_bias + stuck_step, self.max_stuck_bias)
+                    self._stuck_bias = min(self._stuck_bias + stuck_step, self._o.max_stuck_bias)
                     t_trv = _round_step(_clamp(t_trv - stuck_step, trv_min, trv_max), step_min)
                     self.last_action = "stuck_overtemp_down"
                 self._stuck_ref_temp = t_room
@@ -611,174 +1030,128 @@ class SmartOffsetController:
     # -------------------------
     # mode handlers
     # -------------------------
-    async def _handle_hvac_off(self, inp: Inputs):
+    def _handle_hvac_off(self, inp: Inputs):
         self._cancel_boost()
-        await self._set_trv_hvac_mode(inp.climate_entity, HVACMode.OFF)
+        if self.last_hvac_mode != _MODE_OFF:
+            self._set_trv_hvac_mode(inp.climate_entity, _MODE_OFF)
         self.last_action = "hvac_off"
         self._stuck_bias = 0.0
         self._reset_stability_tracking()
 
-    async def _handle_window_open(self, inp: Inputs) -> bool:
-        if not inp.window_open:
-            return False
+    def _boost_running(self, now_mono: float) -> bool:
+        return self.boost_active and now_mono < self.boost_until
 
+    def _handle_window_open(self, inp: Inputs):
         self._cancel_boost()
 
-        trv_min = float(self.opt(CONF_TRV_MIN) or DEFAULT_TRV_MIN)
-        step_min = float(self.opt(CONF_STEP_MIN) or DEFAULT_STEP_MIN)
+        step_min = self._o.step_min
 
-        t_trv = _round_step(trv_min, step_min)
+        t_trv = self._o.trv_floor
         self.last_target_trv = t_trv
 
         if self.last_set is None or abs(t_trv - self.last_set) >= (step_min - 1e-9):
-            await self._set_trv_temperature(inp.climate_entity, t_trv)
+            self._set_trv_temperature(inp.climate_entity, t_trv, inp.now_mono)
 
         self.last_action = "window_open"
         self._stuck_bias = 0.0
         self._reset_stability_tracking()
-        return True
-
-    async def _handle_boost(self, inp: Inputs) -> bool:
-        if not self.boost_active or inp.now_mono >= self.boost_until:
-            return False
 
-        trv_min = float(self.opt(CONF_TRV_MIN) or DEFAULT_TRV_MIN)
-        trv_max = float(self.opt(CONF_TRV_MAX) or DEFAULT_TRV_MAX)
-        step_min = float(self.opt(CONF_STEP_MIN) or DEFAULT_STEP_MIN)
+    def _handle_boost(self, inp: Inputs):
+        step_min = self._o.step_min
 
-        t_trv = _round_step(_clamp(trv_max, trv_min, trv_max), step_min)
+        t_trv = self._o.trv_ceiling
         self.last_target_trv = t_trv
 
         self._reset_stability_tracking()
         self._stuck_bias = 0.0
 
         if self.last_set is None or abs(t_trv - self.last_set) >= (step_min - 1e-9):
-            await self._set_trv_temperature(inp.climate_entity, t_trv)
+            self._set_trv_temperature(inp.climate_entity, t_trv, inp.now_mono)
 
         self.last_action = "boost"
-        return True
 
-    async def _handle_deadband_hold(self, inp: Inputs, deadband: float) -> bool:
-        e = inp.t_target - inp.t_room
-        if abs(e) > deadband:
-            return False
-
-        offset = self.storage.get_offset(self.entry.entry_id)
-        trv_min = float(self.opt(CONF_TRV_MIN) or DEFAULT_TRV_MIN)
-        trv_max = float(self.opt(CONF_TRV_MAX) or DEFAULT_TRV_MAX)
-        step_min = float(self.opt(CONF_STEP_MIN) or DEFAULT_STEP_MIN)
-
-        baseline = _round_step(_clamp(inp.t_target + offset, trv_min, trv_max), step_min)
+    def _handle_deadband_hold(self, inp: Inputs, deadband: float):
+        t_target = inp.t_target
 
         target_changed = (
-            self._last_room_target is not None and abs(inp.t_target - self._last_room_target) > 1e-9
+            self._last_room_target is not None and abs(t_target - self._last_room_target) > 1e-9
         )
-        self._last_room_target = inp.t_target
+        self._last_room_target = t_target
 
         if target_changed or self.last_set is None:
+            # baseline нужен только при rebase/init; обычный hold его не считает
+            o = self._o
+            step_min = o.step_min
+            baseline = _round_step(_clamp(t_target + self._offset, o.trv_min, o.trv_max), step_min)
             self.last_target_trv = baseline
             if self.last_set is None or abs(baseline - self.last_set) >= (step_min - 1e-9):
-                await self._set_trv_temperature(inp.climate_entity, baseline)
+                self._set_trv_temperature(inp.climate_entity, baseline, inp.now_mono)
                 self.last_action = "deadband_rebase" if target_changed else "deadband_init"
             self._reset_stability_tracking()
-            return True
+            return
 
         self.last_target_trv = self.last_set
         self.last_action = "hold"
 
-        await self._handle_stable_learning(inp, deadband)
-        return True
+        self._handle_stable_learning(inp, deadband)
 
-    async def _handle_active_control(self, inp: Inputs):
+    def _handle_active_control(self, inp: Inputs):
         t_room = inp.t_room
         t_target = inp.t_target
         e = t_target - t_room
 
-        deadband = float(self.opt(CONF_DEADBAND) or DEFAULT_DEADBAND)
-        step_max = float(self.opt(CONF_STEP_MAX) or DEFAULT_STEP_MAX)
-        step_min = float(self.opt(CONF_STEP_MIN) or DEFAULT_STEP_MIN)
-        learn_rate_fast = float(self.opt(CONF_LEARN_RATE_FAST) or DEFAULT_LEARN_RATE_FAST)
-        min_offset_change = float(self.opt(CONF_MIN_OFFSET_CHANGE) or DEFAULT_MIN_OFFSET_CHANGE)
-        trv_min = float(self.opt(CONF_TRV_MIN) or DEFAULT_TRV_MIN)
-        trv_max = float(self.opt(CONF_TRV_MAX) or DEFAULT_TRV_MAX)
-        cooldown = float(self.opt(CONF_COOLDOWN_SEC) or DEFAULT_COOLDOWN_SEC)
-        enable_learning = bool(self.opt(CONF_ENABLE_LEARNING))
-
-        heating_alpha = float(self.opt(CONF_HEATING_ALPHA) or DEFAULT_HEATING_ALPHA)
-        overshoot_threshold = float(self.opt(CONF_OVERSHOOT_THRESHOLD) or DEFAULT_OVERSHOOT_THRESHOLD)
-        predict_minutes = int(self.opt(CONF_PREDICT_MINUTES) or DEFAULT_PREDICT_MINUTES)
-
-        stuck_enable = bool(self.opt(CONF_STUCK_ENABLE))
-        stuck_seconds = int(self.opt(CONF_STUCK_SECONDS) or DEFAULT_STUCK_SECONDS)
-        stuck_min_drop = float(self.opt(CONF_STUCK_MIN_DROP) or DEFAULT_STUCK_MIN_DROP)
-        stuck_step = float(self.opt(CONF_STUCK_STEP) or DEFAULT_STUCK_STEP)
+        o = self._o
+        deadband = o.deadband
+        step_min = o.step_min
+        learn_rate_fast = o.learn_rate_fast
+        min_offset_change = o.min_offset_change
+        trv_min = o.trv_min
+        trv_max = o.trv_max
+        cooldown = o.cooldown
+        enable_learning = o.enable_learning
 
-        # TTT learning episode
-        self._maybe_start_heat_episode(inp.now_mono, t_room, t_target, deadband)
-        self._update_heat_episode(t_room)
-        await self._maybe_finish_heat_episode(inp.now_mono, t_room, t_target, deadband)
-
-        offset = self.storage.get_offset(self.entry.entry_id)
-
-        # overshoot auto-tune (reduce slow learn rate if overheating often)
-        if t_room > t_target + overshoot_threshold:
-            new_count = await self.storage.increment_overshoot_count(self.entry.entry_id)
-            self._overshoot_count = new_count
-            if self._overshoot_count > 3:
-                self._learn_rate_slow = max(0.01, self._learn_rate_slow * 0.9)
-                LOGGER.info("Auto-tune: снижен learn_rate_slow до %.3f из-за перегрева", self._learn_rate_slow)
-                self._overshoot_count = 0
-
-        learn_rate = learn_rate_fast if abs(e) > deadband * 2 else self._learn_rate_slow
-
-        # active learning: adjust offset towards reducing error
-        if enable_learning and abs(e) > deadband:
-            learn_direction = 1 if e > 0 else -1
-            new_offset = _clamp(
-                offset + learn_direction * learn_rate * abs(e), MIN_OFFSET, MAX_OFFSET
-            )
-            if abs(new_offset - offset) >= min_offset_change:
-                offset = new_offset
-                await self.storage.set_offset(self.entry.entry_id, offset, reason="active_learning")
-                self._last_offset_update = inp.now_mono
+        overshoot_threshold = o.overshoot_threshold
 
-        # correction (P-like)
-        correction = _clamp(0.5 * e, -step_max, step_max)
-        added_compensation = 0.0
-        outdoor_temp = self._get_outdoor_temperature()
-        if outdoor_temp is not None and outdoor_temp < 10:  # активируем компенсацию до +10°C
-            # Линейная компенсация: от 0 при +10°C до +2.0 при -20°C и ниже
-            added_compensation = max(0.0, (10 - outdoor_temp) * 0.15)  # 0.15 — коэффициент (можно вынести в опцию)
-            added_compensation = min(added_compensation, 2.0)  # максимум +2°C для безопасности
+        stuck_enable = o.stuck_enable
+        stuck_seconds = o.stuck_seconds
+        stuck_min_drop = o.stuck_min_drop
+        stuck_step = o.stuck_step
 
-            correction += added_compensation
-            if added_compensation > 0:
-                LOGGER.debug(
-                    "Outdoor compensation applied: outdoor=%.1f°C, added=%.2f°C (total correction=%.2f°C)",
-                    outdoor_temp, added_compensation, correction
+        # TTT learning episode
+        self._step_heat_episode(inp.now_mono, t_room, t_target, deadband)
+
+        offset = self._offset
+
+        if enable_learning:
+            # overshoot auto-tune (reduce slow learn rate if overheating often)
+            if t_room > t_target + overshoot_threshold:
+                new_count = self.storage.increment_overshoot_count(self._entry_id)
+                self._overshoot_count = new_count
+                if self._overshoot_count > 3:
+                    self._learn_rate_slow = max(0.01, self._learn_rate_slow * 0.9)
+                    LOGGER.info("Auto-tune: снижен learn_rate_slow до %.3f из-за перегрева", self._learn_rate_slow)
+                    self._overshoot_count = 0
+
+            # active learning: adjust offset towards reducing error
+            if abs(e) > deadband:
+                learn_rate = learn_rate_fast if abs(e) > deadband * 2 else self._learn_rate_slow
+                learn_direction = 1 if e > 0 else -1
+                new_offset = _clamp(
+                    offset + learn_direction * learn_rate * abs(e), MIN_OFFSET, MAX_OFFSET
                 )
-        else:
-            LOGGER.debug("Outdoor compensation skipped: no valid outdoor temperature or outdoor_temp >= 10°C")
+                if abs(new_offset - offset) >= min_offset_change:
+                    offset = new_offset
+                    self._update_offset(offset, reason="active_learning")
+                    self._last_offset_update = inp.now_mono
 
-        # soft landing for small TTT
-        if e > 0:
-            predicted_minutes_ttt = e * self._minutes_per_degree
-            if predicted_minutes_ttt < self.ttt_soft_min:
-                factor = _clamp(predicted_minutes_ttt / self.ttt_soft_min, 0.3, 1.0)
-                correction *= factor
-
-        # overshoot prevention from heating_rate
-        if e > 0 and self._heating_rate > 0.001:
-            predicted_time = e / self._heating_rate  # minutes
-            if predicted_time < predict_minutes:
-                factor = max(0.5, 1.0 - (predict_minutes - predicted_time) / predict_minutes)
-                correction *= factor
-
-        t_trv = _round_step(t_target + offset + correction, step_min)
+        # _round_step / _clamp на основном пути раскрыты вручную (вызываются каждый тик)
+        t_trv = t_target + offset + self._compute_correction(e)
+        if step_min > 0:
+            t_trv = round(t_trv / step_min) * step_min
 
         # stuck logic: when overheated but room temp doesn't drop, force more aggressive down
         if stuck_enable and (not self.window_is_open) and (not self.boost_active):
-            t_trv = await self._handle_stuck_detection(
+            t_trv = self._handle_stuck_detection(
                 t_room,
                 e,
                 deadband,
@@ -794,12 +1167,15 @@ class SmartOffsetController:
 
         # apply accumulated stuck_bias in overheat zone
         if e < -deadband and self._stuck_bias > 0:
-            t_trv = _round_step(_clamp(t_trv - self._stuck_bias, trv_min, trv_max), step_min)
-
-        if e > 0:
-            predicted_minutes_ttt = e * self._minutes_per_degree
-
-        t_trv = _clamp(t_trv, trv_min, trv_max)
+            t_trv -= self._stuck_bias
+            t_trv = trv_min if t_trv < trv_min else trv_max if t_trv > trv_max else t_trv
+            if step_min > 0:
+                t_trv = round(t_trv / step_min) * step_min
+
+        if t_trv < trv_min:
+            t_trv = trv_min
+        elif t_trv > trv_max:
+            t_trv = trv_max
         self.last_target_trv = t_trv
 
         # anti spam (step threshold + cooldown)
@@ -811,20 +1187,60 @@ class SmartOffsetController:
                 self.last_action = "cooldown"
                 return
 
-        success = await self._set_trv_temperature(inp.climate_entity, t_trv)
+        success = self._set_trv_temperature(inp.climate_entity, t_trv, inp.now_mono)
         if success:
             self.last_action = "set_temperature"
 
         # update dynamics only while heating is actually needed
+        # (скорость нагрева — не обучение: по ней работают защита от перегрева и прогноз)
         if e > deadband and not self.window_is_open and not self.boost_active:
-            await self._update_heating_rate(t_room, inp.now_mono, heating_alpha)
+            self._update_heating_rate(t_room, inp.now_mono)
 
-        await self._handle_offset_decay(inp.now_mono, enable_learning)
+        if enable_learning:
+            self._handle_offset_decay(inp.now_mono)
+
+    def _compute_correction(self, e: float) -> float:
+        """Чистый расчёт поправки к t_target + offset (без I/O и await)."""
+        # correction (P-like)
+        step_max = self._o.step_max
+        correction = 0.5 * e
+        correction = -step_max if correction < -step_max else step_max if correction > step_max else correction
+        added_compensation = 0.0
+        outdoor_temp = self._get_outdoor_temperature()
+        if outdoor_temp is not None and outdoor_temp < 10:  # активируем компенсацию до +10°C
+            # Линейная компенсация: от 0 при +10°C до +2.0 при -20°C и ниже
+            added_compensation = max(0.0, (10 - outdoor_temp) * 0.15)  # 0.15 — коэффициент (можно вынести в опцию)
+            added_compensation = min(added_compensation, 2.0)  # максимум +2°C для безопасности
+
+            correction += added_compensation
+            if added_compensation > 0:
+                LOGGER.debug(
+                    "Outdoor compensation applied: outdoor=%.1f°C, added=%.2f°C (total correction=%.2f°C)",
+                    outdoor_temp, added_compensation, correction
+                )
+        # без else-лога: "skipped" писался бы на каждом тике всё тёплое время года
+
+        # soft landing for small TTT
+        if e > 0:
+            predicted_minutes_ttt = e * self._minutes_per_degree
+            if predicted_minutes_ttt < self._o.ttt_soft_min:
+                factor = _clamp(predicted_minutes_ttt / self._o.ttt_soft_min, 0.3, 1.0)
+                correction *= factor
+
+        # overshoot prevention from heating_rate
+        predict_minutes = self._o.predict_minutes
+        if e > 0 and self._heating_rate > 0.001:
+            predicted_time = e / self._heating_rate  # minutes
+            if predicted_time < predict_minutes:
+                factor = max(0.5, 1.0 - (predict_minutes - predicted_time) / predict_minutes)
+                correction *= factor
+
+        return correction
 
     def _get_outdoor_temperature(self) -> Optional[float]:
         """Получить текущую наружную температуру из outdoor_sensor или weather_entity."""
         # Приоритет: outdoor_sensor
-        outdoor_entity = self.opt(CONF_OUTDOOR_SENSOR)
+        outdoor_entity = self._o.outdoor_sensor
         if outdoor_entity:
             state = self.hass.states.get(outdoor_entity)
             if state and state.state not in ("unavailable", "unknown"):
@@ -834,7 +1250,7 @@ class SmartOffsetController:
                     pass
 
         # Fallback: weather_entity
-        weather_entity = self.opt(CONF_WEATHER_ENTITY)
+        weather_entity = self._o.weather_entity
         if weather_entity:
             state = self.hass.states.get(weather_entity)
             if state and state.attributes:
@@ -850,51 +1266,52 @@ class SmartOffsetController:
     # -------------------------
     # main tick
     # -------------------------
-    async def _tick(self, _):
-        now_mono = self.hass.loop.time()
-
-        inp = await self._read_inputs(now_mono)
-        if not inp:
-            self._notify()
-            return
-
-        # compute error for sensors
-        e = inp.t_target - inp.t_room
-        self.last_error = round(e, 3)
-
-        # virtual hvac_mode -> enforce TRV mode
-        if inp.hvac_mode == HVACMode.OFF.value:
-            await self._handle_hvac_off(inp)
-            self._prev_room_temp = inp.t_room
-            self._prev_time = now_mono
-            self._notify()
-            return  # IMPORTANT: hard-stop; don't continue control
-
-        # ensure heat (no spam inside _set_trv_hvac_mode)
-        await self._set_trv_hvac_mode(inp.climate_entity, HVACMode.HEAT)
-
-        # window / boost / hold / control
-        if await self._handle_window_open(inp):
-            self._prev_room_temp = inp.t_room
-            self._prev_time = now_mono
-            self._notify()
-            return
+    def _finish_tick(self, t_room: float, now_mono: float):
+        self._prev_room_temp = t_room
+        self._prev_time = now_mono
+        self._notify()
 
-        if await self._handle_boost(inp):
-            self._prev_room_temp = inp.t_room
-            self._prev_time = now_mono
-            self._notify()
+    async def _tick(self, _):
+        if self._stopped:
             return
+        now_mono = self._monotonic()
 
-        deadband = float(self.opt(CONF_DEADBAND) or DEFAULT_DEADBAND)
-        if await self._handle_deadband_hold(inp, deadband):
-            self._prev_room_temp = inp.t_room
-            self._prev_time = now_mono
+        inp = self._read_inputs(now_mono)
+        if not inp:
             self._notify()
             return
 
-        await self._handle_active_control(inp)
+        t_room = inp.t_room
+        climate_entity = inp.climate_entity
 
-        self._prev_room_temp = inp.t_room
-        self._prev_time = now_mono
-        self._notify()
\ No newline at end of file
+        # compute error for sensors
+        e = inp.t_target - t_room
+        error_milli = round(e * 1000)
+        if error_milli != self._last_error_milli:
+            self._last_error_milli = error_milli
+            self.last_error = error_milli / 1000
+
+        # одна цепочка выбора режима: off / window / boost / hold / control;
+        # предикаты синхронные, window и boost без I/O — вызываются без await
+        deadband = self._o.deadband
+        if inp.hvac_mode == _MODE_OFF:
+            # virtual hvac_mode OFF: hard-stop, регулирование не продолжаем
+            self._handle_hvac_off(inp)
+        else:
+            # ensure heat; last_hvac_mode — теневая копия режима TRV, без лишнего await
+            if self.last_hvac_mode != _MODE_HEAT:
+                self._set_trv_hvac_mode(climate_entity, _MODE_HEAT)
+
+            if inp.window_open:
+                self._handle_window_open(inp)
+            elif self._boost_running(now_mono):
+                self._handle_boost(inp)
+            elif abs(e) <= deadband:
+                self._handle_deadband_hold(inp, deadband)
+            else:
+                self._handle_active_control(inp)
+                # далеко от цели — ещё один тик на середине интервала
+                if abs(e) > 2 * deadband:
+                    self._schedule_catchup_tick()
+
+        self._finish_tick(t_room, now_mono)
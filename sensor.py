@@ -1,7 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Any, Callable, Optional, Sequence
-import json
+from typing import Any, Callable, Optional
 import logging
 
 
@@ -16,7 +15,14 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.const import UnitOfTemperature, UnitOfTime
-from .const import DOMAIN, SIGNAL_UPDATE, CONF_ROOM_TARGET
+from .const import (
+    DOMAIN,
+    SIGNAL_UPDATE,
+    UPDATE_GROUP_TEMPS,
+    UPDATE_GROUP_ACTION,
+    UPDATE_GROUP_STATE,
+    UPDATE_GROUP_HISTORY,
+)
 
 
 
@@ -26,14 +32,15 @@ _LOGGER = logging.getLogger(__name__)
 
 
 
-@dataclass(frozen=True)
+@dataclass(slots=True, frozen=True)
 class SensorDefinition:
     """Определение сенсора."""
     key: str
+    group: str = UPDATE_GROUP_TEMPS  # группа сигнала обновления (см. UPDATE_GROUPS)
     unit: str | None = None
     device_class: str | None = None
     state_class: str | None = None
-    options: Sequence[str] | None = None
+    options: list[str] | None = None  # общий список для всех сущностей; HA его не меняет
     suggested_display_precision: int | None = None
 
 
@@ -103,39 +110,45 @@ SENSORS = (
         state_class=SensorStateClass.MEASUREMENT,
         suggested_display_precision=2
     ),
-    SensorDefinition(key="last_action"),
+    SensorDefinition(key="last_action", group=UPDATE_GROUP_ACTION),
     SensorDefinition(
         key="last_action_text",
+        group=UPDATE_GROUP_ACTION,
         device_class=SensorDeviceClass.ENUM,
         options=LAST_ACTION_OPTIONS
     ),
     SensorDefinition(
         key="change_count",
+        group=UPDATE_GROUP_ACTION,
         state_class=SensorStateClass.TOTAL_INCREASING,
         suggested_display_precision=0
     ),
     SensorDefinition(
         key="window_state",
+        group=UPDATE_GROUP_STATE,
         device_class=SensorDeviceClass.ENUM,
         options=["open", "closed"]
     ),
     SensorDefinition(
         key="boost_remaining",
+        group=UPDATE_GROUP_STATE,
         unit=UnitOfTime.SECONDS,
         device_class=SensorDeviceClass.DURATION,
         state_class=SensorStateClass.MEASUREMENT
     ),
     SensorDefinition(
         key="boost_active",
+        group=UPDATE_GROUP_STATE,
         device_class=SensorDeviceClass.ENUM,
         options=["on", "off"]
     ),
     SensorDefinition(
         key="control_paused",
+        group=UPDATE_GROUP_STATE,
         device_class=SensorDeviceClass.ENUM,
         options=["on", "off"]
     ),
-    SensorDefinition(key="history_graph"),
+    SensorDefinition(key="history_graph", group=UPDATE_GROUP_HISTORY),
     SensorDefinition(
         key="heating_rate",
         unit="°C/min",
@@ -161,18 +174,170 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Настройка сенсоров для конфигурационной записи."""
-    if entry.entry_id not in hass.data[DOMAIN]:
+    controller = hass.data[DOMAIN].get(entry.entry_id)
+    if controller is None:
         return
-    
-    controller = hass.data[DOMAIN][entry.entry_id]
+
     entities = [SmartOffsetDebugSensor(hass, entry, controller, d) for d in SENSORS]
     async_add_entities(entities)
 
 
 
 
+def _nv_error(sensor: SmartOffsetDebugSensor):
+    # контроллер уже хранит ошибку в тысячных (error_milli / 1000)
+    return sensor.controller.last_error or 0.0
+
+
+def _nv_offset(sensor: SmartOffsetDebugSensor):
+    return round(sensor.controller.offset, 3)
+
+
+def _nv_target_trv(sensor: SmartOffsetDebugSensor):
+    val = sensor.controller.last_target_trv
+    return round(float(val), 2) if val is not None else None
+
+
+def _nv_history_graph(sensor: SmartOffsetDebugSensor):
+    history_data = sensor.controller._history_data
+    count = len(history_data)
+    if count == 0:
+        return "No data yet"
+    return f"{count} points"
+
+
+def _nv_last_set(sensor: SmartOffsetDebugSensor):
+    val = sensor.controller.last_set
+    return round(float(val), 2) if val is not None else None
+
+
+def _nv_last_action(sensor: SmartOffsetDebugSensor):
+    action = sensor.controller.last_action
+    return str(action)
+
+
+def _nv_last_action_text(sensor: SmartOffsetDebugSensor):
+    # last_action — всегда строковый литерал контроллера; get() — одна проба в точный dict
+    return ACTION_MAPPING.get(sensor.controller.last_action, "unknown")
+
+
+def _nv_change_count(sensor: SmartOffsetDebugSensor):
+    return int(sensor.controller.change_count)
+
+
+def _nv_window_state(sensor: SmartOffsetDebugSensor):
+    is_open = sensor.controller.window_is_open
+    return "open" if is_open else "closed"
+
+
+def _nv_boost_remaining(sensor: SmartOffsetDebugSensor):
+    if not sensor.controller.boost_active:
+        return 0
+    until = sensor.controller.boost_until
+    remaining = max(0, int(until - sensor.controller.loop_now))
+    return remaining
+
+
+def _nv_boost_active(sensor: SmartOffsetDebugSensor):
+    active = sensor.controller.boost_active
+    until = sensor.controller.boost_until
+    is_active = active and sensor.controller.loop_now < until
+    return "on" if is_active else "off"
+
+
+def _nv_control_paused(sensor: SmartOffsetDebugSensor):
+    wo = sensor.controller.window_is_open
+    ba = sensor.controller.boost_active
+    until = sensor.controller.boost_until
+    paused = wo or (ba and sensor.controller.loop_now < until)
+    return "on" if paused else "off"
+
+
+def _nv_heating_rate(sensor: SmartOffsetDebugSensor):
+    rate = sensor.controller._heating_rate
+    return round(float(rate), 3) if rate is not None else None
+
+
+def _nv_predicted_time(sensor: SmartOffsetDebugSensor):
+    heating_rate = sensor.controller._heating_rate
+    error = sensor.controller.last_error
+
+    if heating_rate > 0.001 and error is not None and error > 0:
+        # Рассчитываем время в минутах
+        time_minutes = error / heating_rate
+        return round(time_minutes, 1)
+    return None
+
+
+def _nv_learn_rate_current(sensor: SmartOffsetDebugSensor):
+    learn_rate = getattr(sensor.controller, "_learn_rate_slow", 0.1)
+    return round(float(learn_rate), 3)
+
+
+def _nv_none(sensor: SmartOffsetDebugSensor):
+    return None
+
+
+# key -> функция значения; выбирается один раз в __init__ вместо цепочки if/elif
+_NATIVE_VALUE_HANDLERS: dict[str, Callable[[SmartOffsetDebugSensor], Any]] = {
+    "error": _nv_error,
+    "offset": _nv_offset,
+    "target_trv": _nv_target_trv,
+    "history_graph": _nv_history_graph,
+    "last_set": _nv_last_set,
+    "last_action": _nv_last_action,
+    "last_action_text": _nv_last_action_text,
+    "change_count": _nv_change_count,
+    "window_state": _nv_window_state,
+    "boost_remaining": _nv_boost_remaining,
+    "boost_active": _nv_boost_active,
+    "control_paused": _nv_control_paused,
+    "heating_rate": _nv_heating_rate,
+    "predicted_time": _nv_predicted_time,
+    "learn_rate_current": _nv_learn_rate_current,
+}
+
+
+def _attrs_history(sensor: SmartOffsetDebugSensor, attrs: dict[str, Any]) -> None:
+    attrs.update({
+        "history_json": sensor.controller.history_json(),
+        "data_points": len(sensor.controller._history_data),
+    })
+
+
+def _attrs_action(sensor: SmartOffsetDebugSensor, attrs: dict[str, Any]) -> None:
+    attrs.update({
+        "last_error": sensor.controller.last_error,
+        "window_is_open": sensor.controller.window_is_open,
+        "boost_active": sensor.controller.boost_active,
+        "change_count": sensor.controller.change_count,
+        "last_set": sensor.controller.last_set,
+        "last_target_trv": sensor.controller.last_target_trv,
+    })
+
+
+def _attrs_default(sensor: SmartOffsetDebugSensor, attrs: dict[str, Any]) -> None:
+    return None
+
+
+# Специфичные атрибуты для разных типов сенсоров
+_ATTRS_HANDLERS: dict[str, Callable[[SmartOffsetDebugSensor, dict[str, Any]], None]] = {
+    "history_graph": _attrs_history,
+    "last_action": _attrs_action,
+    "last_action_text": _attrs_action,
+}
+
+
+
+
 class SmartOffsetDebugSensor(SensorEntity):
     """Сенсор для отладки Smart Offset Thermostat."""
+
+    # свои поля — в слотах (как у контроллера); _attr_* и служебные поля HA остаются в __dict__ базы
+    __slots__ = (
+        "entry", "controller", "definition", "_unsub", "_last_written",
+        "_value_fn", "_attrs_fn", "_device_info", "_base_attrs",
+    )
     
     _attr_has_entity_name = True
     _attr_entity_registry_enabled_default = False
@@ -202,49 +367,39 @@ class SmartOffsetDebugSensor(SensorEntity):
         if definition.suggested_display_precision is not None:
             self._attr_suggested_display_precision = definition.suggested_display_precision
         if definition.options:
-            self._attr_options = list(definition.options)
+            self._attr_options = definition.options
         
         self._unsub: Optional[Callable[[], None]] = None
+        self._last_written: Optional[tuple] = None
 
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Информация об устройстве."""
-        return DeviceInfo(
-            identifiers={(DOMAIN, self.entry.entry_id)},
+        # неизменны до перезагрузки entry: строим один раз
+        self._device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
             name="Smart Offset Thermostat",
             manufacturer="Custom",
             model="Smart Offset Thermostat",
         )
+        self._base_attrs: dict[str, Any] = {
+            "thermostat": entry.data.get("climate"),
+            "room_sensor": entry.data.get("room_sensor"),
+        }
+        self._value_fn = _NATIVE_VALUE_HANDLERS.get(definition.key, _nv_none)
+        self._attrs_fn = _ATTRS_HANDLERS.get(definition.key, _attrs_default)
+
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Информация об устройстве."""
+        return self._device_info
 
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Дополнительные атрибуты сенсора."""
-        attrs = {
-            "thermostat": self.entry.data.get("climate"),
-            "room_sensor": self.entry.data.get("room_sensor"),
-            "room_target": self.controller.opt(CONF_ROOM_TARGET),
-        }
+        attrs = {**self._base_attrs, "room_target": self.controller.room_target}
         
         # Добавляем специфичные атрибуты для разных типов сенсоров
-        if self.definition.key == "history_graph":
-            history_data = getattr(self.controller, "_history_data", [])
-            attrs.update({
-                "history_json": json.dumps(history_data),
-                "history_data": history_data,
-                "data_points": len(history_data),
-            })
-        
-        elif self.definition.key in ["last_action", "last_action_text"]:
-            attrs.update({
-                "last_error": self.controller.last_error,
-                "window_is_open": getattr(self.controller, "window_is_open", False),
-                "boost_active": getattr(self.controller, "boost_active", False),
-                "change_count": getattr(self.controller, "change_count", 0),
-                "last_set": self.controller.last_set,
-                "last_target_trv": self.controller.last_target_trv,
-            })
+        self._attrs_fn(self, attrs)
         
         return attrs
 
@@ -252,102 +407,10 @@ class SmartOffsetDebugSensor(SensorEntity):
     @property
     def native_value(self):
         """Текущее значение сенсора."""
-        k = self.definition.key
-        
         try:
-            # Обработка error сенсора
-            if k == "error":
-                err = self.controller.last_error
-                return round(float(err or 0.0), 3)
-            
-            # Обработка offset сенсора
-            elif k == "offset":
-                offset = self.controller.storage.get_offset(self.entry.entry_id)
-                return round(float(offset or 0.0), 3)
-            
-            # Обработка target_trv сенсора
-            elif k == "target_trv":
-                val = self.controller.last_target_trv
-                return round(float(val), 2) if val is not None else None
-            
-            # Обработка history_graph сенсора
-            elif k == "history_graph":
-                history_data = getattr(self.controller, "_history_data", [])
-                count = len(history_data)
-                if count == 0:
-                    return "No data yet"
-                return f"{count} points"
-            
-            # Обработка last_set сенсора
-            elif k == "last_set":
-                val = self.controller.last_set
-                return round(float(val), 2) if val is not None else None
-            
-            # Обработка last_action сенсора
-            elif k == "last_action":
-                action = getattr(self.controller, "last_action", "init")
-                return str(action)
-            
-            # Обработка last_action_text сенсора
-            elif k == "last_action_text":
-                action = str(getattr(self.controller, "last_action", "init"))
-                return ACTION_MAPPING.get(action, "unknown")
-            
-            # Обработка change_count сенсора
-            elif k == "change_count":
-                return int(getattr(self.controller, "change_count", 0))
-            
-            # Обработка window_state сенсора
-            elif k == "window_state":
-                is_open = getattr(self.controller, "window_is_open", False)
-                return "open" if is_open else "closed"
-            
-            # Обработка boost_remaining сенсора
-            elif k == "boost_remaining":
-                if not getattr(self.controller, "boost_active", False):
-                    return 0
-                until = getattr(self.controller, "boost_until", 0)
-                remaining = max(0, int(until - self.hass.loop.time()))
-                return remaining
-            
-            # Обработка boost_active сенсора
-            elif k == "boost_active":
-                active = getattr(self.controller, "boost_active", False)
-                until = getattr(self.controller, "boost_until", 0)
-                is_active = active and self.hass.loop.time() < until
-                return "on" if is_active else "off"
-            
-            # Обработка control_paused сенсора
-            elif k == "control_paused":
-                wo = getattr(self.controller, "window_is_open", False)
-                ba = getattr(self.controller, "boost_active", False)
-                until = getattr(self.controller, "boost_until", 0)
-                paused = wo or (ba and self.hass.loop.time() < until)
-                return "on" if paused else "off"
-            
-            # Обработка heating_rate сенсора
-            elif k == "heating_rate":
-                rate = getattr(self.controller, "_heating_rate", 0.1)
-                return round(float(rate), 3) if rate is not None else None
-            
-            # Обработка predicted_time сенсора
-            elif k == "predicted_time":
-                heating_rate = getattr(self.controller, "_heating_rate", 0.1)
-                error = self.controller.last_error
-                
-                if heating_rate > 0.001 and error is not None and error > 0:
-                    # Рассчитываем время в минутах
-                    time_minutes = error / heating_rate
-                    return round(time_minutes, 1)
-                return None
-            
-            # Обработка learn_rate_current сенсора (если добавлен)
-            elif k == "learn_rate_current":
-                learn_rate = getattr(self.controller, "_learn_rate_slow", 0.1)
-                return round(float(learn_rate), 3)
-            
+            return self._value_fn(self)
         except Exception as e:
-            _LOGGER.error("Error in sensor %s: %s", k, str(e), exc_info=True)
+            _LOGGER.error("Error in sensor %s: %s", self.definition.key, e)
         
         return None
 
@@ -356,18 +419,23 @@ class SmartOffsetDebugSensor(SensorEntity):
         """Вызывается при добавлении сенсора в Home Assistant."""
         @callback
         def _update():
-            """Обновить состояние сенсора."""
+            """Обновить состояние сенсора, если значение или атрибуты изменились."""
+            # JSON истории закэширован контроллером: сравнение строк идёт по identity
+            written = (self.native_value, self.extra_state_attributes)
+            if written == self._last_written:
+                return
+            self._last_written = written
             self.async_write_ha_state()
         
         # Подписываемся на обновления от контроллера
         self._unsub = async_dispatcher_connect(
             self.hass,
-            f"{SIGNAL_UPDATE}_{self.entry.entry_id}",
+            f"{SIGNAL_UPDATE}_{self.entry.entry_id}_{self.definition.group}",
             _update,
         )
         
         # Первоначальное обновление
-        self.async_write_ha_state()
+        _update()
 
 
     async def async_will_remove_from_hass(self) -> None:
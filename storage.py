@@ -1,134 +1,265 @@
 from __future__ import annotations
+from homeassistant.core import callback
 from homeassistant.helpers.storage import Store
 import asyncio
-import time
-from typing import Any, Dict, List, Optional
+import sys
+from time import time as _time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
 from datetime import datetime, timedelta
 
 
 _STORAGE_VERSION = 1
 _STORAGE_KEY = "smart_thermostat"
 _MAX_HISTORY_DAYS = 7  # Храним историю только 7 дней
+_MAX_HISTORY_SECONDS = _MAX_HISTORY_DAYS * 24 * 3600
 _MAX_HISTORY_ENTRIES = 1000  # Максимальное количество записей в истории
-_SAVE_DEBOUNCE_SECONDS = 2.0  # Задержка перед сохранением
+_SAVE_DEBOUNCE_SECONDS = 30.0  # Задержка перед сохранением (HA дописывает отложенное при остановке)
+_SAVE_SOON_SECONDS = 1.0  # Короткое окно для серии удалений entry
+
+class OffsetRec(NamedTuple):
+    """Запись offset_history (в JSON хранится как dict)."""
+
+    timestamp: float = 0.0
+    offset: float = 0.0
+    reason: str = ""
+
+
+class RateRec(NamedTuple):
+    """Запись heating_rate_history (в JSON хранится как dict)."""
+
+    timestamp: float = 0.0
+    rate: float = 0.0
+    reason: str = ""
+
+
+class OvershootRec(NamedTuple):
+    """Запись overshoot_history (в JSON хранится как dict)."""
+
+    timestamp: float = 0.0
+    temperature: float = 0.0
+    overshoot: float = 0.0
+    reason: str = ""
+
+
+# Журналы внутри entry: в памяти deque(maxlen) из NamedTuple — append без пересрезов
+# и без dict на запись; в JSON — list из dict (формат файла прежний)
+_BOUNDED_HISTORIES = {
+    "offset_history": (100, OffsetRec),
+    "heating_rate_history": (50, RateRec),
+    "overshoot_history": (50, OvershootRec),
+}
+
+
+def _rec_from_dict(rec: type, fields: tuple, h: Dict[str, Any]) -> Any:
+    """Запись из dict файла; reason — из малого набора, интернируем (одна строка на всех)."""
+    values = {f: h[f] for f in fields if f in h}
+    reason = values.get("reason")
+    if type(reason) is str and reason:
+        values["reason"] = sys.intern(reason)
+    return rec(**values)
+
+
+def _bounded_history(entry_data: Dict[str, Any], key: str) -> deque:
+    """Журнал entry как deque(maxlen) записей (создаётся при первой записи)."""
+    history = entry_data.get(key)
+    if type(history) is not deque:
+        maxlen, rec = _BOUNDED_HISTORIES[key]
+        fields = rec._fields
+        history = entry_data[key] = deque(
+            (
+                h if isinstance(h, rec) else _rec_from_dict(rec, fields, h)
+                for h in history or ()
+                if isinstance(h, (rec, dict))
+            ),
+            maxlen=maxlen,
+        )
+    return history
+
+
+def _records_as_dicts(history: Iterable[Any]) -> List[Dict[str, Any]]:
+    return [h._asdict() for h in history]
+
+
+def _point_time(entry: Dict[str, Any]) -> float:
+    return entry.get('time', 0)
+
+
+def _trim_history(history: List[Dict[str, Any]], cutoff_time: float) -> List[Dict[str, Any]]:
+    """Точки идут по возрастанию time: устаревшие — префикс, ищем его границу bisect'ом."""
+    start = bisect_left(history, cutoff_time, key=_point_time)
+    # Ограничение по количеству записей
+    return history[max(start, len(history) - _MAX_HISTORY_ENTRIES):]
+
+
+def _history_entry_as_dict(entry: Any) -> Dict[str, Any]:
+    """Точки истории контроллера приходят как NamedTuple — в JSON храним dict."""
+    as_dict = getattr(entry, "_asdict", None)
+    return as_dict() if as_dict is not None else entry
 
 
 class OffsetStorage:
     def __init__(self, hass):
         self._store = Store(hass, _STORAGE_VERSION, _STORAGE_KEY)
         self._data: Dict[str, Dict[str, Any]] = {}
+        # history_<entry_id> -> снимок точек; в dict/JSON разворачиваем один раз при записи
+        self._pending_history: Dict[str, List[Any]] = {}
+        # ключи entry в _data (без history_<entry_id>) — обходы не фильтруют все ключи
+        self._entry_ids: set[str] = set()
         self.hass = hass
-        self._save_task: Optional[asyncio.Task] = None
+        self._monotonic = hass.loop.time  # связанный метод, как в контроллере
         self._lock = asyncio.Lock()
-        self._pending_save = False
+        # версия _data: растёт при каждой мутации; принудительная запись пропускается,
+        # если эта версия уже записана (отмечается только после успешного async_save)
+        self._dirty_version = 0
+        self._saved_version = 0
+        # отложенная запись Store уже запланирована (сбрасывается при снятии снимка)
+        self._save_scheduled = False
+        # persistent_notification.async_create — импортируется при первой ошибке записи
+        self._notify = None
 
     async def async_load(self):
         """Асинхронная загрузка данных."""
         async with self._lock:
             self._data = await self._store.async_load() or {}
+            self._entry_ids = {
+                k for k, v in self._data.items()
+                if isinstance(v, dict) and not k.startswith("history_")
+            }
             # Очистка устаревшей истории при загрузке
             self._cleanup_old_history()
 
-    async def async_save(self, force: bool = False):
-        """Асинхронное сохранение с debounce."""
-        self._pending_save = True
-        
-        if force:
-            # Принудительное сохранение
-            if self._save_task:
-                self._save_task.cancel()
-                self._save_task = None
-            await self._perform_save()
-            return
-        
-        # Debounce сохранение
-        if self._save_task and not self._save_task.done():
+    def _entry_data(self, entry_id: str) -> Dict[str, Any]:
+        """dict entry (создаётся при первой записи; без лишнего {} как у setdefault)."""
+        entry_data = self._data.get(entry_id)
+        if entry_data is None:
+            entry_data = self._data[entry_id] = {}
+            self._entry_ids.add(entry_id)
+        return entry_data
+
+    def _get_number(self, entry_id: str, key: str, default: Any, cast: type = float) -> Any:
+        """Число из entry: один поиск entry без временного {}; мусор в файле -> default."""
+        entry_data = self._data.get(entry_id)
+        if entry_data is None:
+            return default
+        value = entry_data.get(key)
+        if value is None:
+            return default
+        try:
+            return cast(value)
+        except (ValueError, TypeError):
+            return default
+
+    @callback
+    def schedule_save(self) -> None:
+        """Debounce: серия вызовов -> одна запись через _SAVE_DEBOUNCE_SECONDS.
+
+        Таймер Store ставится один раз на окно: повторные вызовы (от любых entry)
+        только увеличивают версию, и одна запись сохраняет всё накопленное.
+        При падении теряется не больше _SAVE_DEBOUNCE_SECONDS изменений.
+        """
+        self._dirty_version += 1
+        if self._save_scheduled:
             return
-        
-        self._save_task = self.hass.async_create_task(self._debounced_save())
+        self._save_scheduled = True
+        self._store.async_delay_save(self._data_to_save, _SAVE_DEBOUNCE_SECONDS)
+
+    @callback
+    def schedule_save_soon(self) -> None:
+        """Запись через _SAVE_SOON_SECONDS: серия вызовов подряд -> одна запись."""
+        self._dirty_version += 1
+        self._save_scheduled = True
+        # Store переставляет свой таймер — более короткая задержка заменяет обычную
+        self._store.async_delay_save(self._data_to_save, _SAVE_SOON_SECONDS)
+
+    async def async_save_force(self) -> None:
+        """Принудительное сохранение (Store сам снимает отложенное)."""
+        await self._perform_save()
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        self._flush_pending_history()
+        self._save_scheduled = False
+        # deque записей журналов -> list из dict для JSON; копируется только верхний уровень entry
+        return {
+            key: (
+                {k: _records_as_dicts(v) if type(v) is deque else v for k, v in entry_data.items()}
+                if isinstance(entry_data, dict)
+                else entry_data
+            )
+            for key, entry_data in self._data.items()
+        }
 
-    async def _debounced_save(self):
-        """Отложенное сохранение с debounce."""
-        await asyncio.sleep(_SAVE_DEBOUNCE_SECONDS)
-        
-        if not self._pending_save:
+    @callback
+    def _flush_pending_history(self) -> None:
+        """Развернуть отложенные снимки истории в dict с очисткой по времени/количеству."""
+        if not self._pending_history:
             return
-        
-        async with self._lock:
-            await self._perform_save()
-        
-        self._pending_save = False
-        self._save_task = None
+        cutoff_time = _time() - _MAX_HISTORY_SECONDS
+        for history_key, history in self._pending_history.items():
+            self._data[history_key] = _trim_history(
+                list(map(_history_entry_as_dict, history)), cutoff_time
+            )
+        self._pending_history.clear()
 
     async def _perform_save(self):
         """Выполнить фактическое сохранение."""
+        if self._saved_version == self._dirty_version:
+            return
         try:
-            await self._store.async_save(self._data)
+            # мутации _data синхронны (один поток цикла) — лок сериализует только запись
+            async with self._lock:
+                version = self._dirty_version
+                await self._store.async_save(self._data_to_save())
         except Exception as e:
             # Логируем ошибку, но не падаем
-            self.hass.components.persistent_notification.async_create(
+            if self._notify is None:
+                from homeassistant.components import persistent_notification
+
+                self._notify = persistent_notification.async_create
+            self._notify(
+                self.hass,
                 f"Ошибка сохранения настроек термостата: {e}",
                 title="Smart Offset Thermostat",
                 notification_id="smart_offset_storage_error"
             )
+        else:
+            self._saved_version = version
 
     def _cleanup_old_history(self):
-        cutoff_time = time.time() - (_MAX_HISTORY_DAYS * 24 * 3600)
-
-        for entry_id in list(self._data.keys()):
-            # пропускаем отдельные ключи истории контроллера
-            if isinstance(entry_id, str) and entry_id.startswith("history_"):
-                continue
-
-            entry_data = self._data.get(entry_id)
-            if not isinstance(entry_data, dict):
-                continue
-
-            # offset_history
-            history = entry_data.get("offset_history", [])
-            if isinstance(history, list):
-                # если ты уже хранишь timestamp как epoch — можно чистить по cutoff_time
-                # history = [h for h in history if h.get("timestamp", 0) >= cutoff_time]
-                if len(history) > _MAX_HISTORY_ENTRIES:
-                    history = history[-_MAX_HISTORY_ENTRIES:]
-                entry_data["offset_history"] = history
-
-            # heating_rate_history
-            hr = entry_data.get("heating_rate_history", [])
-            if isinstance(hr, list) and len(hr) > 50:
-                entry_data["heating_rate_history"] = hr[-50:]
-
-            # overshoot_history
-            oh = entry_data.get("overshoot_history", [])
-            if isinstance(oh, list) and len(oh) > 50:
-                entry_data["overshoot_history"] = oh[-50:]
+        for entry_id in self._entry_ids:
+            entry_data = self._data[entry_id]
+            # offset_history / heating_rate_history / overshoot_history:
+            # deque(maxlen) сам оставляет последние N записей
+            for key in _BOUNDED_HISTORIES:
+                if isinstance(entry_data.get(key), list):
+                    _bounded_history(entry_data, key)
 
     # ========== ОСНОВНЫЕ МЕТОДЫ ДЛЯ OFFSET ==========
 
     def get_offset(self, entry_id: str) -> float:
         """Получить текущее смещение."""
-        try:
-            return float(self._data.get(entry_id, {}).get("offset", 0.0))
-        except (ValueError, TypeError):
-            return 0.0
+        return self._get_number(entry_id, "offset", 0.0)
 
-    async def set_offset(self, entry_id: str, offset: float, reason: str = "") -> None:
+    @callback
+    def set_offset(self, entry_id: str, offset: float, reason: str = "") -> None:
         """Установить смещение и сохранить время изменения."""
-        async with self._lock:
-            entry_data = self._data.setdefault(entry_id, {})
-            old_offset = entry_data.get("offset", 0.0)
-            entry_data["offset"] = float(offset)
-            entry_data["last_offset_change"] = self.hass.loop.time()
-            entry_data["last_offset_value"] = float(old_offset)
-            
-            # Добавляем в историю
-            self._add_offset_history(entry_id, offset, reason)
-            
-            # Увеличиваем счетчик изменений
-            self._increment_offset_changes(entry_id)
+        entry_data = self._entry_data(entry_id)
+        old_offset = entry_data.get("offset", 0.0)
+        entry_data["offset"] = float(offset)
+        now = self._monotonic()
+        entry_data["last_offset_change"] = now
+        entry_data["last_offset_value"] = float(old_offset)
+        
+        # Добавляем в историю
+        self._add_offset_history(entry_data, now, offset, reason)
+        
+        # Увеличиваем счетчик изменений
+        self._increment_offset_changes(entry_data)
         
         # Асинхронное сохранение
-        await self.async_save()
+        self.schedule_save()
 
     def get_last_offset_change(self, entry_id: str) -> Optional[float]:
         """Время последнего изменения offset (в секундах монотонных часов)."""
@@ -136,10 +267,7 @@ class OffsetStorage:
 
     def get_last_offset_value(self, entry_id: str) -> float:
         """Последнее значение offset до изменения."""
-        try:
-            return float(self._data.get(entry_id, {}).get("last_offset_value", 0.0))
-        except (ValueError, TypeError):
-            return 0.0
+        return self._get_number(entry_id, "last_offset_value", 0.0)
 
     def get_learning_stats(self, entry_id: str) -> Dict[str, Any]:
         """Получить статистику обучения."""
@@ -155,182 +283,135 @@ class OffsetStorage:
     def get_history(self, entry_id: str) -> List[Dict[str, Any]]:
         """Получить историю для данного entry."""
         history_key = f"history_{entry_id}"
+        self._flush_pending_history()
         history = self._data.get(history_key, [])
         
         # Очистка устаревших записей
-        cutoff_time = time.time() - (_MAX_HISTORY_DAYS * 24 * 3600)
-        cleaned_history = [
-            entry for entry in history 
-            if entry.get('time', 0) >= cutoff_time
-        ]
-        
-        # Ограничение по количеству записей
-        if len(cleaned_history) > _MAX_HISTORY_ENTRIES:
-            cleaned_history = cleaned_history[-_MAX_HISTORY_ENTRIES:]
-        
-        return cleaned_history
+        cutoff_time = _time() - _MAX_HISTORY_SECONDS
+        return _trim_history(history, cutoff_time)
 
-    async def set_history(self, entry_id: str, history: List[Dict[str, Any]]) -> None:
-        """Сохранить историю."""
-        history_key = f"history_{entry_id}"
-        
-        async with self._lock:
-            # Очистка устаревших записей перед сохранением
-            cutoff_time = time.time() - (_MAX_HISTORY_DAYS * 24 * 3600)
-            cleaned_history = [
-                entry for entry in history 
-                if entry.get('time', 0) >= cutoff_time
-            ]
-            
-            # Ограничение по количеству записей
-            if len(cleaned_history) > _MAX_HISTORY_ENTRIES:
-                cleaned_history = cleaned_history[-_MAX_HISTORY_ENTRIES:]
-            
-            self._data[history_key] = cleaned_history
-        
-        await self.async_save()
+    @callback
+    def set_history(self, entry_id: str, history: Iterable[Any]) -> None:
+        """Сохранить историю (dict или NamedTuple с _asdict()).
 
-    def _increment_offset_changes(self, entry_id: str):
+        Здесь только снимок точек; очистка и перевод в dict — один раз при записи.
+        """
+        self._pending_history[f"history_{entry_id}"] = list(history)
+        self.schedule_save()
+
+    def _increment_offset_changes(self, entry_data: Dict[str, Any]):
         """Увеличить счетчик изменений offset."""
-        entry_data = self._data.setdefault(entry_id, {})
         entry_data["total_changes"] = entry_data.get("total_changes", 0) + 1
 
-    def _add_offset_history(self, entry_id: str, offset: float, reason: str = ""):
+    def _add_offset_history(
+        self, entry_data: Dict[str, Any], ts: float, offset: float, reason: str = ""
+    ):
         """Добавить запись в историю изменений offset."""
-        entry_data = self._data.setdefault(entry_id, {})
-        history = entry_data.get("offset_history", [])
-        
-        history.append({
-            "timestamp": self.hass.loop.time(),
-            "offset": float(offset),
-            "reason": reason
-        })
-        
-        # Храним только последние 100 изменений
-        if len(history) > 100:
-            history = history[-100:]
-        
-        entry_data["offset_history"] = history
+        # Храним только последние 100 изменений (maxlen)
+        _bounded_history(entry_data, "offset_history").append(
+            OffsetRec(ts, float(offset), reason)
+        )
 
     # ========== МЕТОДЫ ДЛЯ HEATING_RATE ==========
 
     def get_heating_rate(self, entry_id: str) -> float:
         """Получить сохраненную скорость нагрева."""
-        try:
-            return float(self._data.get(entry_id, {}).get("heating_rate", 0.1))
-        except (ValueError, TypeError):
-            return 0.1
+        return self._get_number(entry_id, "heating_rate", 0.1)
 
-    async def set_heating_rate(self, entry_id: str, rate: float, reason: str = "") -> None:
+    @callback
+    def set_heating_rate(self, entry_id: str, rate: float, reason: str = "") -> None:
         """Сохранить скорость нагрева."""
-        async with self._lock:
-            entry_data = self._data.setdefault(entry_id, {})
-            entry_data["heating_rate"] = float(rate)
-            
-            # Добавляем в историю
-            self._add_heating_rate_history(entry_id, rate, reason)
+        entry_data = self._entry_data(entry_id)
+        entry_data["heating_rate"] = float(rate)
+        
+        # Добавляем в историю
+        self._add_heating_rate_history(entry_data, self._monotonic(), rate, reason)
         
-        await self.async_save()
+        self.schedule_save()
 
     def get_heating_rate_history(self, entry_id: str) -> List[Dict[str, Any]]:
         """Получить историю изменений скорости нагрева."""
         entry_data = self._data.get(entry_id, {})
-        return entry_data.get("heating_rate_history", [])
+        return _records_as_dicts(entry_data.get("heating_rate_history", ()))
 
-    def _add_heating_rate_history(self, entry_id: str, rate: float, reason: str = ""):
+    def _add_heating_rate_history(
+        self, entry_data: Dict[str, Any], ts: float, rate: float, reason: str = ""
+    ):
         """Добавить запись в историю изменений скорости нагрева."""
-        entry_data = self._data.setdefault(entry_id, {})
-        history = entry_data.get("heating_rate_history", [])
-        
-        history.append({
-            "timestamp": self.hass.loop.time(),
-            "rate": float(rate),
-            "reason": reason
-        })
-        
-        # Храним только последние 50 изменений
-        if len(history) > 50:
-            history = history[-50:]
-        
-        entry_data["heating_rate_history"] = history
+        # Храним только последние 50 изменений (maxlen)
+        _bounded_history(entry_data, "heating_rate_history").append(
+            RateRec(ts, float(rate), reason)
+        )
 
     # ========== МЕТОДЫ ДЛЯ OVERSHOOT_COUNT ==========
 
     def get_overshoot_count(self, entry_id: str) -> int:
         """Получить счетчик перегрева."""
-        try:
-            return int(self._data.get(entry_id, {}).get("overshoot_count", 0))
-        except (ValueError, TypeError):
-            return 0
+        return self._get_number(entry_id, "overshoot_count", 0, int)
 
-    async def set_overshoot_count(self, entry_id: str, count: int) -> None:
+    @callback
+    def set_overshoot_count(self, entry_id: str, count: int) -> None:
         """Установить счетчик перегрева."""
-        async with self._lock:
-            entry_data = self._data.setdefault(entry_id, {})
-            entry_data["overshoot_count"] = int(count)
+        entry_data = self._entry_data(entry_id)
+        count = int(count)
+        if entry_data.get("overshoot_count") == count:
+            return
+        entry_data["overshoot_count"] = count
         
-        await self.async_save()
+        self.schedule_save()
 
-    async def increment_overshoot_count(self, entry_id: str) -> int:
+    @callback
+    def increment_overshoot_count(self, entry_id: str) -> int:
         """Увеличить счетчик перегрева на 1 и вернуть новое значение."""
-        async with self._lock:
-            entry_data = self._data.setdefault(entry_id, {})
-            current = entry_data.get("overshoot_count", 0)
-            new_count = current + 1
-            entry_data["overshoot_count"] = new_count
+        entry_data = self._entry_data(entry_id)
+        current = entry_data.get("overshoot_count", 0)
+        new_count = current + 1
+        entry_data["overshoot_count"] = new_count
         
-        await self.async_save()
+        self.schedule_save()
         return new_count
 
-    async def reset_overshoot_count(self, entry_id: str) -> None:
+    @callback
+    def reset_overshoot_count(self, entry_id: str) -> None:
         """Сбросить счетчик перегрева."""
-        async with self._lock:
-            entry_data = self._data.setdefault(entry_id, {})
-            entry_data["overshoot_count"] = 0
+        entry_data = self._entry_data(entry_id)
+        if entry_data.get("overshoot_count") == 0:
+            return
+        entry_data["overshoot_count"] = 0
         
-        await self.async_save()
+        self.schedule_save()
 
     def get_overshoot_history(self, entry_id: str) -> List[Dict[str, Any]]:
         """Получить историю перегревов."""
         entry_data = self._data.get(entry_id, {})
-        return entry_data.get("overshoot_history", [])
+        return _records_as_dicts(entry_data.get("overshoot_history", ()))
 
-    async def add_overshoot_history(self, entry_id: str, temperature: float, overshoot: float, reason: str = "") -> None:
+    @callback
+    def add_overshoot_history(self, entry_id: str, temperature: float, overshoot: float, reason: str = "") -> None:
         """Добавить запись в историю перегревов."""
-        async with self._lock:
-            entry_data = self._data.setdefault(entry_id, {})
-            history = entry_data.get("overshoot_history", [])
-            
-            history.append({
-                "timestamp": self.hass.loop.time(),
-                "temperature": float(temperature),
-                "overshoot": float(overshoot),
-                "reason": reason
-            })
-            
-            # Храним только последние 50 перегревов
-            if len(history) > 50:
-                history = history[-50:]
-            
-            entry_data["overshoot_history"] = history
+        entry_data = self._entry_data(entry_id)
+        # Храним только последние 50 перегревов (maxlen)
+        _bounded_history(entry_data, "overshoot_history").append(
+            OvershootRec(self._monotonic(), float(temperature), float(overshoot), reason)
+        )
         
-        await self.async_save()
+        self.schedule_save()
 
     # ========== ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ ==========
 
     async def cleanup_old_data(self, entry_id: str = None):
         """Очистка устаревших данных."""
-        async with self._lock:
-            if entry_id:
-                # Очистка для конкретного entry
-                if entry_id in self._data:
-                    self._cleanup_entry_history(entry_id)
-            else:
-                # Очистка для всех entries
-                for eid in list(self._data.keys()):
-                    self._cleanup_entry_history(eid)
+        if entry_id:
+            # Очистка для конкретного entry
+            if entry_id in self._data:
+                self._cleanup_entry_history(entry_id)
+        else:
+            # Очистка для всех entries
+            for eid in self._entry_ids:
+                self._cleanup_entry_history(eid)
         
-        await self.async_save(force=True)
+        self._dirty_version += 1
+        await self.async_save_force()
 
     def _cleanup_entry_history(self, entry_id: str):
         """Очистка истории для конкретного entry."""
@@ -338,56 +419,42 @@ class OffsetStorage:
             return
         
         entry_data = self._data[entry_id]
-        cutoff_time = time.time() - (_MAX_HISTORY_DAYS * 24 * 3600)
-        
-        # Очистка offset_history
-        if "offset_history" in entry_data:
-            history = entry_data["offset_history"]
-            cleaned = [h for h in history if h.get("timestamp", 0) >= cutoff_time]
-            if len(cleaned) > 100:
-                cleaned = cleaned[-100:]
-            entry_data["offset_history"] = cleaned
-        
-        # Очистка heating_rate_history
-        if "heating_rate_history" in entry_data:
-            history = entry_data["heating_rate_history"]
-            cleaned = [h for h in history if h.get("timestamp", 0) >= cutoff_time]
-            if len(cleaned) > 50:
-                cleaned = cleaned[-50:]
-            entry_data["heating_rate_history"] = cleaned
+        cutoff_time = _time() - _MAX_HISTORY_SECONDS
         
-        # Очистка overshoot_history
-        if "overshoot_history" in entry_data:
-            history = entry_data["overshoot_history"]
-            cleaned = [h for h in history if h.get("timestamp", 0) >= cutoff_time]
-            if len(cleaned) > 50:
-                cleaned = cleaned[-50:]
-            entry_data["overshoot_history"] = cleaned
+        # Очистка offset_history / heating_rate_history / overshoot_history:
+        # записи добавляются по времени — устаревшие снимаем с головы
+        for key in _BOUNDED_HISTORIES:
+            if key in entry_data:
+                history = _bounded_history(entry_data, key)
+                while history and history[0].timestamp < cutoff_time:
+                    history.popleft()
 
     def get_all_entries(self) -> List[str]:
         """Получить список всех entry_id."""
-        return [k for k in self._data.keys() if not k.startswith("history_")]
+        return list(self._entry_ids)
 
     async def remove_entry(self, entry_id: str) -> None:
         """Удалить данные для entry."""
-        async with self._lock:
-            if entry_id in self._data:
-                del self._data[entry_id]
-            # Также удаляем историю
-            history_key = f"history_{entry_id}"
-            if history_key in self._data:
-                del self._data[history_key]
+        if entry_id in self._data:
+            del self._data[entry_id]
+        self._entry_ids.discard(entry_id)
+        # Также удаляем историю
+        history_key = f"history_{entry_id}"
+        self._pending_history.pop(history_key, None)
+        if history_key in self._data:
+            del self._data[history_key]
         
-        await self.async_save(force=True)
+        # удаления при разборе интеграции идут подряд — одна запись на всю серию
+        self.schedule_save_soon()
 
     def get_minutes_per_degree(self, entry_id: str) -> float:
-        try:
-            return float(self._data.get(entry_id, {}).get("minutes_per_degree", 15.0))
-        except (ValueError, TypeError):
-            return 15.0
+        return self._get_number(entry_id, "minutes_per_degree", 15.0)
 
-    async def set_minutes_per_degree(self, entry_id: str, mpd: float) -> None:
-        async with self._lock:
-            entry_data = self._data.setdefault(entry_id, {})
-            entry_data["minutes_per_degree"] = float(mpd)
-        await self.async_save()
\ No newline at end of file
+    @callback
+    def set_minutes_per_degree(self, entry_id: str, mpd: float) -> None:
+        entry_data = self._entry_data(entry_id)
+        mpd = float(mpd)
+        if entry_data.get("minutes_per_degree") == mpd:
+            return
+        entry_data["minutes_per_degree"] = mpd
+        self.schedule_save()
@@ -12,7 +12,9 @@ from homeassistant.components.switch import SwitchEntity
 from .const import DOMAIN, SIGNAL_UPDATE
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback):
-    controller = hass.data[DOMAIN][entry.entry_id]
+    controller = hass.data[DOMAIN].get(entry.entry_id)
+    if controller is None:
+        return
     async_add_entities([SmartOffsetBoostSwitch(hass, entry, controller)])
 
 class SmartOffsetBoostSwitch(SwitchEntity):